@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Project
+from .models import Project, AnalysisJob, AIUsage, BatchAnalysisJob
 
 admin.site.register(Project)
-
+admin.site.register(AnalysisJob)
+admin.site.register(AIUsage)
+admin.site.register(BatchAnalysisJob)
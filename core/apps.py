@@ -1,6 +1,16 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        if settings.GEMINI_WARMUP:
+            from core.services.ai_client import warm_up_model_cache
+
+            # Don't hold up startup on the network round-trip.
+            threading.Thread(target=warm_up_model_cache, name="planix-gemini-warmup", daemon=True).start()
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models.project import Project
+from core.services.batch_analysis import analyze_projects
+
+
+class Command(BaseCommand):
+    help = "(Re)analyse every project of the given users, or of all users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", default=[],
+                            help="Username whose projects should be analysed (repeatable).")
+        parser.add_argument("--all", action="store_true",
+                            help="Analyse the projects of every user.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Size of the generation thread pool.")
+        parser.add_argument("--rate", type=float, default=None,
+                            help="Maximum provider calls started per minute.")
+        parser.add_argument("--no-cache", action="store_true",
+                            help="Bypass the AI response cache.")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            projects = Project.objects.all()
+        elif options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+            missing = set(options["usernames"]) - set(users.values_list("username", flat=True))
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+            projects = Project.objects.filter(user__in=users)
+        else:
+            raise CommandError("Pass --user USERNAME or --all.")
+
+        report = analyze_projects(
+            projects,
+            max_workers=options["workers"],
+            rate_per_minute=options["rate"],
+            use_cache=not options["no_cache"],
+        )
+
+        self.stdout.write(
+            f"Analysed {report['projects']} project(s) "
+            f"({report['unique_prompts']} unique prompt(s)), "
+            f"created {report['created']} analysis row(s) in {report['elapsed_seconds']}s "
+            f"— {report['projects_per_minute']} projects/min."
+        )
+
+        for project_id, error in report["failures"]:
+            self.stderr.write(f"Project {project_id} failed: {error}")
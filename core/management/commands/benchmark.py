@@ -0,0 +1,260 @@
+import json
+import math
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from core.models.project import Project
+from core.models.project_analysis import ProjectAnalysis
+from core.services.ai_backends import SAMPLE_SECTIONS
+from core.services.analysis_pipeline import build_analysis, bulk_save_analyses
+from core.services.pdf_reports import pdf_storage
+from core.services.report_sections import SECTION_FIELDS
+
+ENDPOINTS = [
+    "dashboard",
+    "analysis_history",
+    "generate_analysis",
+    "download_analysis_pdf",
+    "export_analysis_history_zip",
+]
+
+# Endpoints timed with the PDF cache emptied before every request, so that
+# each one renders instead of serving the first render from storage.
+UNCACHED_PDF_ENDPOINTS = {"download_analysis_pdf"}
+
+BENCHMARK_SETTINGS = {
+    "AI_BACKEND": "local",
+    "ANALYSIS_JOBS_EAGER": True,
+    "AI_LOCAL_FAILURE_RATE": 0,
+    # Time the pipeline, not the inline PDF render that eager jobs would add.
+    "PDF_PRERENDER": False,
+    # Render in this process so that timings and tracemalloc include it.
+    "PDF_WORKERS": 0,
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        # Measure the real pipeline, not response-cache hits.
+        "ai_responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    },
+}
+
+
+class EndpointError(Exception):
+    """An endpoint answered with a 4xx/5xx status."""
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with users/projects/analyses and report "
+        "p50/p95 latency, query counts and peak memory for the main endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=3)
+        parser.add_argument("--projects", type=int, default=20, help="Projects per user.")
+        parser.add_argument("--analyses", type=int, default=25, help="Analyses per project.")
+        parser.add_argument("--iterations", type=int, default=20, help="Requests per endpoint.")
+        parser.add_argument("--ai-latency", type=float, default=0.0,
+                            help="Simulated AI latency in seconds for generate_analysis.")
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                            help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        # Analysis ids restart with every throwaway database: never reuse PDFs.
+        pdf_dir = tempfile.TemporaryDirectory()
+        storages = {**settings.STORAGES, "pdf_reports": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": pdf_dir.name},
+        }}
+
+        try:
+            with override_settings(
+                AI_LOCAL_LATENCY=options["ai_latency"], STORAGES=storages, **BENCHMARK_SETTINGS
+            ):
+                user, project, analysis = self.seed(
+                    options["users"], options["projects"], options["analyses"]
+                )
+                report = self.run(user, project, analysis, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            pdf_dir.cleanup()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report, options)
+
+    # -------------------------------
+    # Seeding
+    # -------------------------------
+    def seed(self, user_count, projects_per_user, analyses_per_project):
+        password = make_password("benchmark")
+        users = User.objects.bulk_create(
+            User(username=f"bench{i}", password=password) for i in range(user_count)
+        )
+
+        projects = Project.objects.bulk_create(
+            Project(
+                user=user,
+                name=f"Project {i}",
+                description="Benchmark project " * 20,
+                platform=["web", "api", "mobile", "cloud"][i % 4],
+                tech_stack="Django, PostgreSQL, React",
+                scale=["small", "medium", "large"][i % 3],
+                budget=10000 * (i % 15),
+                risk_level=["low", "medium", "high"][i % 3],
+            )
+            for user in users
+            for i in range(projects_per_user)
+        )
+
+        sections = {
+            field: SAMPLE_SECTIONS[header].format(name="Benchmark") * 4
+            for header, field in SECTION_FIELDS
+        }
+        bulk_save_analyses(
+            [
+                build_analysis(project, project.user, sections, (i * 7) % 100, "Medium Risk")
+                for project in projects
+                for i in range(analyses_per_project)
+            ],
+            batch_size=1000,
+        )
+
+        user = users[0]
+        project = Project.objects.filter(user=user).order_by("id").first()
+        analysis = ProjectAnalysis.objects.filter(project=project).order_by("id").first()
+        return user, project, analysis
+
+    # -------------------------------
+    # Measurement
+    # -------------------------------
+    def urls(self, project, analysis):
+        return {
+            "dashboard": reverse("dashboard"),
+            "analysis_history": reverse("analysis_history", args=[project.id]),
+            "generate_analysis": reverse("generate_analysis", args=[project.id]),
+            "download_analysis_pdf": reverse("download_analysis_pdf", args=[analysis.id]),
+            "export_analysis_history_zip": reverse("export_analysis_history_zip", args=[project.id]),
+        }
+
+    def clear_pdf_cache(self):
+        storage = pdf_storage()
+        for name in storage.listdir("")[1]:
+            storage.delete(name)
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            body_size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            body_size = len(response.content)
+        return response.status_code, body_size
+
+    def run(self, user, project, analysis, options):
+        client = Client()
+        client.force_login(user)
+        urls = self.urls(project, analysis)
+        selected = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+
+        report = {
+            "seed": {
+                "users": options["users"],
+                "projects": Project.objects.count(),
+                "analyses": ProjectAnalysis.objects.count(),
+            },
+            "endpoints": {},
+        }
+
+        for name in selected:
+            url = urls[name]
+            timings, queries = [], []
+            status, body_size, error = None, 0, ""
+
+            try:
+                for _ in range(options["iterations"]):
+                    if name in UNCACHED_PDF_ENDPOINTS:
+                        self.clear_pdf_cache()
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        status, body_size = self.request(client, url)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    queries.append(len(captured))
+                    # Error pages are fast; never report them as timings.
+                    if not 200 <= status < 400:
+                        raise EndpointError(f"HTTP {status}")
+
+                # Memory is measured separately: tracemalloc distorts timings.
+                if name in UNCACHED_PDF_ENDPOINTS:
+                    self.clear_pdf_cache()
+                tracemalloc.start()
+                self.request(client, url)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            except Exception as e:
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                error = str(e) if isinstance(e, EndpointError) else f"{type(e).__name__}: {e}"
+                timings, queries = [], []
+                peak = 0
+
+            report["endpoints"][name] = {
+                "status": status,
+                "requests": len(timings),
+                "p50_ms": round(percentile(timings, 50), 2) if timings else None,
+                "p95_ms": round(percentile(timings, 95), 2) if timings else None,
+                "queries": max(queries) if queries else None,
+                "peak_memory_kb": round(peak / 1024, 1),
+                "response_bytes": body_size,
+                "error": error,
+            }
+
+        return report
+
+    def print_report(self, report, options):
+        seed = report["seed"]
+        self.stdout.write(
+            f"Seeded {seed['users']} users, {seed['projects']} projects, "
+            f"{seed['analyses']} analyses; {options['iterations']} requests per endpoint.\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<30}{'status':>8}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}{'peak KB':>12}{'bytes':>12}"
+        )
+        for name, row in report["endpoints"].items():
+            status = row["status"] or "-"
+            if row["error"]:
+                self.stdout.write(f"{name:<30}{status:>8}  failed: {row['error']}")
+                continue
+            self.stdout.write(
+                f"{name:<30}{status:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['queries']:>10}"
+                f"{row['peak_memory_kb']:>12}{row['response_bytes']:>12}"
+            )
@@ -0,0 +1,49 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from core.services.ai_backends import SAMPLE_SECTIONS
+from core.services.report_sections import SECTION_FIELDS, extract_section, parse_sections
+
+
+def build_report(repeat):
+    """
+    A generated report whose sections are the sample sections repeated
+    `repeat` times, as the model would return them.
+    """
+    return "\n\n".join(
+        f"{header}\n" + "\n".join([SAMPLE_SECTIONS[header].format(name="Benchmark")] * repeat)
+        for header, _ in SECTION_FIELDS
+    )
+
+
+def legacy_parse(text):
+    return {field: extract_section(text, header) for header, field in SECTION_FIELDS}
+
+
+class Command(BaseCommand):
+    help = "Compare parse_sections() with the legacy per-header extract_section() on large reports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,10,100,1000",
+                            help="Comma-separated repeat counts for each section's sample text.")
+        parser.add_argument("--number", type=int, default=50, help="Parses per measurement.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'report KB':>10}{'legacy ms':>12}{'single-pass ms':>16}{'speedup':>10}")
+
+        for repeat in (int(size) for size in options["sizes"].split(",")):
+            text = build_report(repeat)
+
+            if parse_sections(text) != legacy_parse(text):
+                self.stderr.write(f"Parsers disagree on the {repeat}x report.")
+
+            legacy = min(timeit.repeat(lambda: legacy_parse(text), number=options["number"], repeat=3))
+            single = min(timeit.repeat(lambda: parse_sections(text), number=options["number"], repeat=3))
+
+            legacy_ms = legacy / options["number"] * 1000
+            single_ms = single / options["number"] * 1000
+            self.stdout.write(
+                f"{len(text.encode()) / 1024:>10.1f}{legacy_ms:>12.3f}{single_ms:>16.3f}"
+                f"{legacy_ms / single_ms:>9.1f}x"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.services.pdf_reports import prune_pdf_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete cached PDFs rendered with an older template version, for "
+        "deleted analyses, or superseded by a newer history render."
+    )
+
+    def handle(self, *args, **options):
+        removed = prune_pdf_cache()
+        self.stdout.write(f"Removed {removed} cached PDF(s).")
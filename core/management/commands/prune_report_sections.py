@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models.analysis_report import SECTION_NAMES, AnalysisReport
+from core.models.report_section import ReportSection
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete report sections no analysis references any more, e.g. after "
+        "analyses or projects were deleted. Safe to run while analyses are "
+        "being saved; schedule it off-peak (daily is plenty)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help="Keep sections stored within the last N minutes: an analysis "
+                 "being saved stores its sections before its report references them.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["min_age"])
+
+        referenced = Q()
+        for name in SECTION_NAMES:
+            referenced |= Q(digest__in=AnalysisReport.objects.values(f"{name}_section"))
+
+        deleted, _ = ReportSection.objects.filter(last_stored_at__lt=cutoff).exclude(referenced).delete()
+        self.stdout.write(f"Pruned {deleted} unreferenced section(s).")
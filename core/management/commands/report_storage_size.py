@@ -0,0 +1,39 @@
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+from django.core.management.base import BaseCommand
+
+from core.models.analysis_report import SECTION_NAMES, AnalysisReport
+from core.models.report_section import ReportSection
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the plain-text size of report sections with what is stored "
+        "after deduplication and compression."
+    )
+
+    def handle(self, *args, **options):
+        plain_size = {
+            digest: len(body.encode("utf-8"))
+            for digest, body in ReportSection.objects.values_list("digest", "body").iterator(chunk_size=500)
+        }
+
+        plain = dict.fromkeys(SECTION_NAMES, 0)
+        for name in SECTION_NAMES:
+            rows = AnalysisReport.objects.values_list(f"{name}_section").annotate(n=Count("pk"))
+            for digest, count in rows.order_by():
+                plain[name] += plain_size.get(digest, 0) * count
+
+        stored = ReportSection.objects.aggregate(total=Sum(Length("body")))["total"] or 0
+
+        self.stdout.write(
+            f"{AnalysisReport.objects.count()} report(s), {len(plain_size)} unique section(s)\n"
+        )
+        self.stdout.write(f"{'section':<24}{'plain bytes':>14}")
+        for name in SECTION_NAMES:
+            self.stdout.write(f"{name:<24}{plain[name]:>14}")
+
+        total = sum(plain.values())
+        ratio = f"{stored / total:.2f}" if total else "-"
+        self.stdout.write(f"{'total':<24}{total:>14}")
+        self.stdout.write(f"\nStored after dedup + compression: {stored} bytes (ratio {ratio})")
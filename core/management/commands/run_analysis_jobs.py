@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.analysis_jobs import process_pending_jobs, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Process pending analysis jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when the queue is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep between polls in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Every iteration: jobs can go stale while this worker runs.
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+            processed = process_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s).")
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["interval"])
@@ -0,0 +1,92 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core.services.metrics import REQUEST_LATENCY, REQUEST_QUERIES
+
+# Query counter of the request being handled. A context variable rather
+# than connection.execute_wrapper(): async views run their queries on
+# sync_to_async threads, whose connections are not the event loop's, but
+# they do run in a copy of the request's context.
+_request_queries = ContextVar("planix_request_queries", default=None)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+class MetricsMiddleware:
+    """
+    Record latency and query count of every request, labelled with the
+    url name from planix/urls.py ("unmatched" for 404s outside any route).
+
+    For streaming responses the latency covers producing the response
+    object, not sending the whole body. Works in both sync and async
+    handler chains so that async views are not pushed onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        # Connections opened before this module was imported.
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        queries = _QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = _QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def _observe(self, request, response, elapsed, queries):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else "unmatched"
+
+        REQUEST_LATENCY.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(queries.count, view=view)
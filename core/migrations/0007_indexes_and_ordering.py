@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 12:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_analysisjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='project',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='projectanalysis',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', 'created_at'], name='core_project_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectanalysis',
+            index=models.Index(fields=['project', 'created_at', 'security_score', 'risk_category'], name='core_analysis_proj_created_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SECTION_FIELDS = [
+    "executive_summary",
+    "architecture",
+    "threat_model",
+    "sdls_recommendations",
+    "cost_estimation",
+    "testing_plan",
+]
+
+
+def copy_sections_to_reports(apps, schema_editor):
+    ProjectAnalysis = apps.get_model("core", "ProjectAnalysis")
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+
+    batch = []
+    for row in ProjectAnalysis.objects.values("id", *SECTION_FIELDS).iterator(
+        chunk_size=500
+    ):
+        analysis_id = row.pop("id")
+        batch.append(AnalysisReport(analysis_id=analysis_id, **row))
+        if len(batch) >= 500:
+            AnalysisReport.objects.bulk_create(batch)
+            batch = []
+    AnalysisReport.objects.bulk_create(batch)
+
+
+def copy_reports_to_sections(apps, schema_editor):
+    ProjectAnalysis = apps.get_model("core", "ProjectAnalysis")
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+
+    for row in AnalysisReport.objects.values("analysis_id", *SECTION_FIELDS).iterator(
+        chunk_size=500
+    ):
+        analysis_id = row.pop("analysis_id")
+        ProjectAnalysis.objects.filter(id=analysis_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_indexes_and_ordering"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisReport",
+            fields=[
+                (
+                    "analysis",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="report",
+                        serialize=False,
+                        to="core.projectanalysis",
+                    ),
+                ),
+                ("executive_summary", models.TextField(blank=True)),
+                ("architecture", models.TextField(blank=True)),
+                ("threat_model", models.TextField(blank=True)),
+                ("sdls_recommendations", models.TextField(blank=True)),
+                ("cost_estimation", models.TextField(blank=True)),
+                ("testing_plan", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(copy_sections_to_reports, copy_reports_to_sections),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="architecture",
+        ),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="cost_estimation",
+        ),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="executive_summary",
+        ),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="sdls_recommendations",
+        ),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="testing_plan",
+        ),
+        migrations.RemoveField(
+            model_name="projectanalysis",
+            name="threat_model",
+        ),
+    ]
@@ -0,0 +1,69 @@
+import core.models.fields
+from django.db import migrations
+
+SECTION_FIELDS = [
+    "executive_summary",
+    "architecture",
+    "threat_model",
+    "sdls_recommendations",
+    "cost_estimation",
+    "testing_plan",
+]
+
+
+def compress_sections(apps, schema_editor):
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+
+    batch = []
+    for report in AnalysisReport.objects.iterator(chunk_size=500):
+        for field in SECTION_FIELDS:
+            setattr(report, f"{field}_z", getattr(report, field))
+        batch.append(report)
+        if len(batch) >= 500:
+            AnalysisReport.objects.bulk_update(batch, [f"{f}_z" for f in SECTION_FIELDS])
+            batch = []
+    AnalysisReport.objects.bulk_update(batch, [f"{f}_z" for f in SECTION_FIELDS])
+
+
+def decompress_sections(apps, schema_editor):
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+
+    batch = []
+    for report in AnalysisReport.objects.iterator(chunk_size=500):
+        for field in SECTION_FIELDS:
+            setattr(report, field, getattr(report, f"{field}_z"))
+        batch.append(report)
+        if len(batch) >= 500:
+            AnalysisReport.objects.bulk_update(batch, SECTION_FIELDS)
+            batch = []
+    AnalysisReport.objects.bulk_update(batch, SECTION_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_analysisreport"),
+    ]
+
+    operations = (
+        [
+            migrations.AddField(
+                model_name="analysisreport",
+                name=f"{field}_z",
+                field=core.models.fields.CompressedTextField(blank=True, default=b""),
+                preserve_default=False,
+            )
+            for field in SECTION_FIELDS
+        ]
+        + [migrations.RunPython(compress_sections, decompress_sections)]
+        + [
+            migrations.RemoveField(model_name="analysisreport", name=field)
+            for field in SECTION_FIELDS
+        ]
+        + [
+            migrations.RenameField(
+                model_name="analysisreport", old_name=f"{field}_z", new_name=field
+            )
+            for field in SECTION_FIELDS
+        ]
+    )
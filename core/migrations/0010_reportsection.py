@@ -0,0 +1,112 @@
+import hashlib
+
+import core.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+SECTION_FIELDS = [
+    "executive_summary",
+    "architecture",
+    "threat_model",
+    "sdls_recommendations",
+    "cost_estimation",
+    "testing_plan",
+]
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def dedupe_sections(apps, schema_editor):
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+    ReportSection = apps.get_model("core", "ReportSection")
+
+    def flush(batch):
+        bodies = {}
+        for report in batch:
+            for field in SECTION_FIELDS:
+                text = getattr(report, field)
+                digest = _digest(text)
+                bodies[digest] = text
+                setattr(report, f"{field}_section_id", digest)
+        ReportSection.objects.bulk_create(
+            [ReportSection(digest=d, body=t) for d, t in bodies.items()],
+            ignore_conflicts=True,
+        )
+        AnalysisReport.objects.bulk_update(batch, [f"{f}_section" for f in SECTION_FIELDS])
+
+    batch = []
+    for report in AnalysisReport.objects.iterator(chunk_size=500):
+        batch.append(report)
+        if len(batch) >= 500:
+            flush(batch)
+            batch = []
+    flush(batch)
+
+
+def inline_sections(apps, schema_editor):
+    AnalysisReport = apps.get_model("core", "AnalysisReport")
+    ReportSection = apps.get_model("core", "ReportSection")
+
+    bodies = dict(ReportSection.objects.values_list("digest", "body"))
+
+    batch = []
+    for report in AnalysisReport.objects.iterator(chunk_size=500):
+        for field in SECTION_FIELDS:
+            setattr(report, field, bodies.get(getattr(report, f"{field}_section_id"), ""))
+        batch.append(report)
+        if len(batch) >= 500:
+            AnalysisReport.objects.bulk_update(batch, SECTION_FIELDS)
+            batch = []
+    AnalysisReport.objects.bulk_update(batch, SECTION_FIELDS)
+
+
+def _section_fk(null):
+    return models.ForeignKey(
+        null=null,
+        on_delete=django.db.models.deletion.PROTECT,
+        related_name="+",
+        to="core.reportsection",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_compress_report_sections"),
+    ]
+
+    operations = (
+        [
+            migrations.CreateModel(
+                name="ReportSection",
+                fields=[
+                    ("digest", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                    ("body", core.models.fields.CompressedTextField(blank=True)),
+                    ("created_at", models.DateTimeField(auto_now_add=True)),
+                ],
+            ),
+        ]
+        + [
+            migrations.AddField(
+                model_name="analysisreport",
+                name=f"{field}_section",
+                field=_section_fk(null=True),
+            )
+            for field in SECTION_FIELDS
+        ]
+        + [migrations.RunPython(dedupe_sections, inline_sections)]
+        + [
+            migrations.RemoveField(model_name="analysisreport", name=field)
+            for field in SECTION_FIELDS
+        ]
+        + [
+            migrations.AlterField(
+                model_name="analysisreport",
+                name=f"{field}_section",
+                field=_section_fk(null=False),
+            )
+            for field in SECTION_FIELDS
+        ]
+    )
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_reportsection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="projectanalysis",
+            name="prompt_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="projectanalysis",
+            name="prompt_truncated",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_analysis_prompt_size"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        choices=[
+                            ("analysis", "Report"),
+                            ("combined", "Report + severity (JSON)"),
+                            ("risk", "Risk adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("backend", models.CharField(max_length=20)),
+                ("model_name", models.CharField(max_length=100)),
+                ("outcome", models.CharField(default="ok", max_length=20)),
+                ("prompt_tokens", models.PositiveIntegerField(default=0)),
+                ("response_tokens", models.PositiveIntegerField(default=0)),
+                ("latency_ms", models.PositiveIntegerField(default=0)),
+                ("cached", models.BooleanField(default=False)),
+                ("estimated", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "analysis",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_usage",
+                        to="core.projectanalysis",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "created_at"],
+                        name="core_aiusage_user_created_idx",
+                    )
+                ],
+            },
+        ),
+    ]
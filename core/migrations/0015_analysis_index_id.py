@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 12:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_analysisjob_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="projectanalysis",
+            name="core_analysis_proj_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="projectanalysis",
+            index=models.Index(
+                fields=[
+                    "project",
+                    "created_at",
+                    "id",
+                    "security_score",
+                    "risk_category",
+                ],
+                name="core_analysis_proj_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_batch_job_heartbeat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportsection",
+            name="last_stored_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
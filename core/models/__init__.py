@@ -1,3 +1,8 @@
 from .project import Project
 from .project_analysis import ProjectAnalysis
 
+from .analysis_job import AnalysisJob
+from .report_section import ReportSection
+from .analysis_report import AnalysisReport
+from .ai_usage import AIUsage
+from .batch_analysis_job import BatchAnalysisJob
@@ -0,0 +1,62 @@
+from django.db import models
+from django.contrib.auth.models import User
+from .project_analysis import ProjectAnalysis
+
+
+class AIUsage(models.Model):
+    """
+    One model call made while producing a ProjectAnalysis (the report
+    itself, the combined JSON call, or the risk adjustment).
+    """
+    PURPOSE_CHOICES = [
+        ("analysis", "Report"),
+        ("combined", "Report + severity (JSON)"),
+        ("risk", "Risk adjustment"),
+    ]
+
+    analysis = models.ForeignKey(ProjectAnalysis, on_delete=models.CASCADE, related_name="ai_usage")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    backend = models.CharField(max_length=20)
+    model_name = models.CharField(max_length=100)
+    outcome = models.CharField(max_length=20, default="ok")
+
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    response_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    cached = models.BooleanField(default=False)
+    # Token counts estimated locally (the backend reported no usage)
+    estimated = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Usage report: per user and per day.
+            models.Index(fields=["user", "created_at"], name="core_aiusage_user_created_idx"),
+        ]
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.response_tokens
+
+    @classmethod
+    def from_call(cls, analysis, call):
+        return cls(
+            analysis=analysis,
+            user_id=analysis.user_id,
+            purpose=call.purpose,
+            backend=call.backend_name,
+            model_name=call.model_name,
+            outcome=call.outcome,
+            prompt_tokens=call.prompt_tokens or 0,
+            response_tokens=call.response_tokens or 0,
+            latency_ms=call.latency_ms,
+            cached=call.cached,
+            estimated=call.estimated,
+        )
+
+    def __str__(self):
+        return f"{self.purpose} call for analysis #{self.analysis_id} ({self.total_tokens} tokens)"
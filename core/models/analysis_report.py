@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.db import models
+from .project_analysis import ProjectAnalysis
+from .report_section import ReportSection
+
+SECTION_NAMES = [
+    "executive_summary",
+    "architecture",
+    "threat_model",
+    "sdls_recommendations",
+    "cost_estimation",
+    "testing_plan",
+]
+
+
+def _section_fk():
+    return models.ForeignKey(ReportSection, on_delete=models.PROTECT, related_name="+")
+
+
+class AnalysisReport(models.Model):
+    """
+    The generated report of a ProjectAnalysis, kept out of the analysis row
+    so listings only read scores and dates. Each section points at a
+    deduplicated ReportSection; read the text through section_texts().
+    """
+    analysis = models.OneToOneField(
+        ProjectAnalysis, on_delete=models.CASCADE, primary_key=True, related_name="report"
+    )
+
+    executive_summary_section = _section_fk()
+    architecture_section = _section_fk()
+    threat_model_section = _section_fk()
+    sdls_recommendations_section = _section_fk()
+    cost_estimation_section = _section_fk()
+    testing_plan_section = _section_fk()
+
+    @classmethod
+    def build(cls, sections):
+        """
+        Unsaved report for {section name: text}; the texts are written to
+        ReportSection by save_sections() before the report itself is saved.
+        """
+        report = cls()
+        report._texts = {name: sections.get(name, "") for name in SECTION_NAMES}
+        for name, text in report._texts.items():
+            setattr(report, f"{name}_section_id", ReportSection.digest_for(text))
+        return report
+
+    @classmethod
+    def save_sections(cls, reports):
+        ReportSection.store(
+            text for report in reports for text in report._texts.values()
+        )
+
+    def section_digests(self):
+        return {name: getattr(self, f"{name}_section_id") for name in SECTION_NAMES}
+
+    def section_texts(self):
+        """
+        {section name: text}, loaded with a single query. Section bodies are
+        immutable, so they are also shared through the cache by digest.
+        """
+        if getattr(self, "_texts", None) is None:
+            digests = self.section_digests()
+            bodies = load_section_bodies(digests.values())
+            self._texts = {name: bodies.get(digest, "") for name, digest in digests.items()}
+        return self._texts
+
+    def __str__(self):
+        return f"Report for analysis #{self.analysis_id}"
+
+
+def prefetch_section_texts(reports):
+    """
+    Fill section_texts() for many reports with one lookup; sections shared
+    between reports are loaded and decompressed once.
+    """
+    reports = [report for report in reports if getattr(report, "_texts", None) is None]
+    bodies = load_section_bodies(
+        digest for report in reports for digest in report.section_digests().values()
+    )
+    for report in reports:
+        report._texts = {
+            name: bodies.get(digest, "") for name, digest in report.section_digests().items()
+        }
+
+
+def load_section_bodies(digests):
+    """
+    {digest: text} for the given digests, from the cache where possible.
+    """
+    digests = set(digests)
+    keys = {f"report_section:{digest}": digest for digest in digests}
+
+    bodies = {keys[key]: body for key, body in cache.get_many(keys).items()}
+    missing = digests - bodies.keys()
+
+    if missing:
+        fetched = dict(
+            ReportSection.objects.filter(digest__in=missing).values_list("digest", "body")
+        )
+        cache.set_many({f"report_section:{digest}": body for digest, body in fetched.items()})
+        bodies.update(fetched)
+
+    return bodies
@@ -0,0 +1,46 @@
+from django.db import models
+from django.contrib.auth.models import User
+from .analysis_job import AnalysisJob
+
+
+class BatchAnalysisJob(models.Model):
+    """
+    A queued bulk re-analysis (see batch_analysis.analyze_projects); the
+    batch report is stored in `report` once it has run.
+    """
+    SCOPE_OWN = "own"
+    SCOPE_ALL = "all"
+
+    SCOPE_CHOICES = [
+        (SCOPE_OWN, "Own projects"),
+        (SCOPE_ALL, "All projects"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="batch_analysis_jobs")
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES, default=SCOPE_OWN)
+    status = models.CharField(max_length=20, choices=AnalysisJob.STATUS_CHOICES, default=AnalysisJob.STATUS_PENDING)
+    report = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Heartbeat: refreshed while the batch runs (see analysis_jobs)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # One queued or running batch per user.
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status__in=[AnalysisJob.STATUS_PENDING, AnalysisJob.STATUS_RUNNING]),
+                name="core_batchjob_one_active_per_user",
+            ),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (AnalysisJob.STATUS_DONE, AnalysisJob.STATUS_FAILED)
+
+    def __str__(self):
+        return f"Batch analysis job #{self.id} ({self.scope}, {self.status})"
@@ -0,0 +1,55 @@
+import zlib
+
+from django.db import models
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text stored zlib-compressed in a binary column. Model instances (and
+    values()/values_list()) always see a plain str; only the database holds
+    the compressed bytes.
+    """
+
+    def __init__(self, *args, compression_level=6, **kwargs):
+        self.compression_level = compression_level
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.compression_level != 6:
+            kwargs["compression_level"] = self.compression_level
+        return name, path, args, kwargs
+
+    def get_default(self):
+        if self.has_default() and not callable(self.default):
+            return self.default
+        default = super().get_default()
+        return "" if default == b"" else default
+
+    def _decompress(self, value):
+        # Empty text is stored as empty bytes rather than a zlib header.
+        if not value:
+            return ""
+        return zlib.decompress(bytes(value)).decode("utf-8")
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self._decompress(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return self._decompress(value)
+        return value
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            value = zlib.compress(value.encode("utf-8"), self.compression_level) if value else b""
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.TextField().formfield(**kwargs)
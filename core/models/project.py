@@ -28,5 +28,12 @@ class Project(models.Model):
     risk_level = models.CharField(max_length=20, choices=RISK_LEVEL_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Dashboard: a user's projects, newest first.
+            models.Index(fields=['user', 'created_at'], name='core_project_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
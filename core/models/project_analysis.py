@@ -1,26 +1,56 @@
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.contrib.auth.models import User
 from .project import Project
 
 
+def _report_section(name):
+    """
+    Read-through accessor for a section stored on the related AnalysisReport
+    (loaded lazily, or up front with select_related("report")).
+    """
+    def getter(self):
+        try:
+            return self.report.section_texts()[name]
+        except ObjectDoesNotExist:
+            return ""
+
+    return property(getter)
+
+
 class ProjectAnalysis(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="analyses")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
-    architecture = models.TextField(blank=True)
-    threat_model = models.TextField(blank=True)
-    cost_estimation = models.TextField(blank=True)
-    sdls_recommendations = models.TextField(blank=True)
-    testing_plan = models.TextField(blank=True)
-
     created_at = models.DateTimeField(auto_now_add=True)
-    executive_summary = models.TextField(blank=True)
 
     security_score = models.IntegerField(default=0)
     risk_category = models.CharField(max_length=20, default="Unknown")
 
+    # Size of the prompts sent for this analysis (see prompts.prompt_stats)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    prompt_truncated = models.BooleanField(default=False)
+
+    # Report text lives in AnalysisReport
+    executive_summary = _report_section("executive_summary")
+    architecture = _report_section("architecture")
+    threat_model = _report_section("threat_model")
+    sdls_recommendations = _report_section("sdls_recommendations")
+    cost_estimation = _report_section("cost_estimation")
+    testing_plan = _report_section("testing_plan")
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # History, ZIP export and the dashboard's latest-analysis subquery all
+            # filter on project and order by created_at (id breaks ties);
+            # score/category are included so the listing and trend queries
+            # never touch the table.
+            models.Index(
+                fields=["project", "created_at", "id", "security_score", "risk_category"],
+                name="core_analysis_proj_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Analysis for {self.project.name} ({self.created_at})"
-
-
@@ -0,0 +1,39 @@
+import hashlib
+
+from django.db import models
+from .fields import CompressedTextField
+
+
+class ReportSection(models.Model):
+    """
+    Content-addressed section text: identical sections produced by different
+    analyses are stored once, keyed by the SHA-256 of their text.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    body = CompressedTextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed whenever an analysis stores this text again; see the
+    # prune_report_sections command
+    last_stored_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def digest_for(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def store(cls, texts):
+        """
+        Ensure every text in `texts` has a row; returns {text: digest}.
+        Rows that already exist only have last_stored_at refreshed.
+        """
+        digests = {text: cls.digest_for(text) for text in set(texts)}
+        cls.objects.bulk_create(
+            [cls(digest=digest, body=text) for text, digest in digests.items()],
+            update_conflicts=True,
+            unique_fields=["digest"],
+            update_fields=["last_stored_at"],
+        )
+        return digests
+
+    def __str__(self):
+        return self.digest
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+
+from core.services.ai_client import AIBackend, AIResponseError, GeminiBackend
+from core.services.report_sections import SECTION_FIELDS
+
+SAMPLE_SECTIONS = {
+    "EXECUTIVE SUMMARY": """- Overall posture: {name} has a reasonable baseline but several exposed surfaces need hardening.
+- Top 3 critical risks: broken access control, injection, insecure dependencies
+- Immediate actions: enforce MFA, add input validation, enable dependency scanning""",
+    "SYSTEM ARCHITECTURE": """- Multi-tier architecture with presentation, application, and data layers
+- Secure API gateway enforcing authentication and rate limiting
+- Encrypted data storage using industry-standard cryptography
+- Logging and monitoring pipeline for audit and incident response""",
+    "THREAT MODEL": """- Spoofing: enforce MFA and token-based identity
+- Tampering: input validation and integrity checks
+- Repudiation: centralized immutable audit logs
+- Information Disclosure: encryption in transit and at rest
+- Denial of Service: WAF + throttling controls
+- Elevation of Privilege: RBAC with least privilege principles
+- OWASP Top 10 mapped to mitigation controls""",
+    "SECURE SDLC": """- Requirements phase includes threat modeling checkpoints
+- Secure design reviews before implementation stages
+- Static code analysis integrated into CI pipeline
+- Dependency scanning and SBOM tracking
+- Pre-deployment penetration testing
+- Continuous security monitoring after release""",
+    "COST ESTIMATION": """- Development effort: medium complexity, 3–5 engineer months
+- Hosting and infrastructure: scalable cloud deployment
+- Security tooling cost ranges provided per testing model
+- Optional add-on: managed security services considerations""",
+    "SECURITY TESTING PLAN": """- SAST, DAST, IAST, and SCA toolchain alignment
+- API fuzz testing and business logic abuse detection
+- Automated regression security suite
+- Red-team simulation and reporting cycle""",
+}
+
+SEVERITY_BY_RISK_LEVEL = {"low": 3, "medium": 5, "high": 8}
+
+
+def _prompt_field(prompt, label):
+    match = re.search(rf"^{label}: (.*)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+class LocalBackend(AIBackend):
+    """
+    Offline backend returning templated reports, for load tests and demos.
+
+    Responses are deterministic for a given prompt. AI_LOCAL_LATENCY adds a
+    fixed delay per call and AI_LOCAL_FAILURE_RATE makes that fraction of
+    calls fail with a transient provider error (seeded by AI_LOCAL_SEED).
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._random = random.Random(settings.AI_LOCAL_SEED)
+        self._lock = threading.Lock()
+
+    def select_model(self):
+        return "local-template"
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < settings.AI_LOCAL_FAILURE_RATE
+        if failed:
+            raise google_exceptions.ServiceUnavailable("Simulated provider failure.")
+
+    def render(self, prompt, generation_config=None):
+        name = _prompt_field(prompt, "Name") or "The system"
+        severity = SEVERITY_BY_RISK_LEVEL.get(_prompt_field(prompt, "Risk Level"), 5)
+
+        if "Return ONLY a number" in prompt:
+            return str(severity)
+
+        sections = {
+            header: SAMPLE_SECTIONS[header].format(name=name)
+            for header, _ in SECTION_FIELDS
+        }
+
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            return json.dumps({"sections": sections, "severity": severity})
+
+        return "\n\n".join(f"{header}\n{body}" for header, body in sections.items())
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        time.sleep(settings.AI_LOCAL_LATENCY)
+        self._maybe_fail()
+        return self.render(prompt, generation_config)
+
+    def stream(self, model_name, prompt, timeout=None):
+        self._maybe_fail()
+        lines = self.render(prompt).splitlines(keepends=True)
+        delay = settings.AI_LOCAL_LATENCY / max(len(lines), 1)
+        for line in lines:
+            time.sleep(delay)
+            yield line
+
+    async def aselect_model(self):
+        return self.select_model()
+
+    async def agenerate(self, model_name, prompt, generation_config=None):
+        await asyncio.sleep(settings.AI_LOCAL_LATENCY)
+        self._maybe_fail()
+        return self.render(prompt, generation_config)
+
+
+class ReplayBackend(AIBackend):
+    """
+    Record live Gemini responses to a JSONL file (AI_REPLAY_MODE=record) and
+    serve them back offline (AI_REPLAY_MODE=replay), optionally with the
+    recorded latency (AI_REPLAY_LATENCY).
+    """
+
+    name = "replay"
+
+    def __init__(self):
+        self.path = Path(settings.AI_REPLAY_FILE)
+        self.mode = settings.AI_REPLAY_MODE
+        self._lock = threading.Lock()
+        self._recordings = self._load()
+        self._upstream = GeminiBackend() if self.mode == "record" else None
+
+    def _load(self):
+        recordings = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        entry = json.loads(line)
+                        recordings[entry["key"]] = entry
+        return recordings
+
+    @staticmethod
+    def _key(prompt, generation_config=None):
+        payload = json.dumps([prompt, generation_config], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record(self, key, text, latency):
+        entry = {"key": key, "response": text, "latency": round(latency, 4)}
+        with self._lock:
+            self._recordings[key] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+
+    def select_model(self):
+        if self._upstream:
+            return self._upstream.select_model()
+        return "replay"
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        key = self._key(prompt, generation_config)
+
+        if self._upstream:
+            started = time.monotonic()
+            text = self._upstream.generate(model_name, prompt, generation_config, timeout)
+            self._record(key, text, time.monotonic() - started)
+            return text
+
+        entry = self._recordings.get(key)
+        if entry is None:
+            raise AIResponseError(f"No recorded response for this prompt in {self.path}.")
+
+        if settings.AI_REPLAY_LATENCY:
+            time.sleep(entry["latency"])
+        return entry["response"]
@@ -1,5 +1,20 @@
 import os
+import json
+import asyncio
+import contextvars
+import hashlib
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from core.services.metrics import AI_CACHE_LOOKUPS, AI_CALL_LATENCY
+from core.services.prompts import estimate_tokens
+from core.services.resilience import CircuitBreaker, backoff_delay
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
@@ -8,20 +23,124 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 _cached_model = None
+_cached_model_expires = 0.0
+
+AI_CACHE_ALIAS = "ai_responses"
+SHARED_CACHE_ALIAS = "shared"
+MODEL_CACHE_KEY = "gemini:selected_model"
+MODEL_FAILURE_KEY = "gemini:model_discovery_failure"
+
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_stats_lock = threading.Lock()
+
+# One semaphore per event loop caps in-flight async Gemini requests.
+_async_semaphores = weakref.WeakKeyDictionary()
+
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+# -------------------------------
+# Errors
+# -------------------------------
+class AIError(Exception):
+    """Base class for failures of the AI backend."""
+
+
+class AIConfigurationError(AIError):
+    """No API key, or no usable model could be selected."""
+
+
+class AITimeoutError(AIError):
+    """The call exceeded its deadline (after retries)."""
+
+
+class AIUnavailableError(AIError):
+    """The provider is failing or the circuit breaker is open."""
+
+
+class AIResponseError(AIError):
+    """The model answered without usable text (e.g. blocked response)."""
+
+
+# Errors worth retrying: the provider may well succeed a moment later.
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.GatewayTimeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+def _local_cached_model():
+    """
+    Per-process copy of the selected model, honouring GEMINI_MODEL_TTL.
+    """
+    if _cached_model and time.monotonic() < _cached_model_expires:
+        return _cached_model
+    return None
+
+
+def _remember_model(model_name):
+    global _cached_model, _cached_model_expires
+
+    _cached_model = model_name
+    _cached_model_expires = time.monotonic() + settings.GEMINI_MODEL_TTL
+    caches[SHARED_CACHE_ALIAS].set(MODEL_CACHE_KEY, model_name, settings.GEMINI_MODEL_TTL)
+    caches[SHARED_CACHE_ALIAS].delete(MODEL_FAILURE_KEY)
+
+
+def _remember_failure(error, previous):
+    """
+    Negative-cache a discovery failure with exponential backoff so that a
+    broken key or provider outage does not re-list models on every call.
+    """
+    failures = (previous or {}).get("failures", 0) + 1
+    backoff = min(
+        settings.GEMINI_MODEL_FAILURE_BACKOFF * 2 ** (failures - 1),
+        settings.GEMINI_MODEL_FAILURE_BACKOFF_MAX,
+    )
+    caches[SHARED_CACHE_ALIAS].set(
+        MODEL_FAILURE_KEY,
+        {"error": error, "failures": failures, "retry_at": time.time() + backoff},
+        # Keep the failure count around past the retry point so backoff keeps growing.
+        backoff + settings.GEMINI_MODEL_FAILURE_BACKOFF_MAX,
+    )
+    return error
 
 
 def _get_available_model():
     """
     Fetch available Gemini models and select one that supports generateContent.
+
+    The selection is cached per process and in the shared cache (so other
+    workers skip the listing) for GEMINI_MODEL_TTL seconds; failures are
+    cached with exponential backoff.
     """
-    global _cached_model
+    global _cached_model, _cached_model_expires
 
-    if _cached_model:
-        return _cached_model
+    local = _local_cached_model()
+    if local:
+        return local
 
     if not GEMINI_API_KEY:
         return None
 
+    shared_cache = caches[SHARED_CACHE_ALIAS]
+
+    shared = shared_cache.get(MODEL_CACHE_KEY)
+    if shared:
+        _cached_model = shared
+        _cached_model_expires = time.monotonic() + settings.GEMINI_MODEL_TTL
+        return shared
+
+    failure = shared_cache.get(MODEL_FAILURE_KEY)
+    if failure and time.time() < failure["retry_at"]:
+        return failure["error"]
+
     try:
         models = genai.list_models()
 
@@ -40,23 +159,391 @@ def _get_available_model():
 
         for model in preferred_order:
             if model in available:
-                _cached_model = model
+                _remember_model(model)
                 return model
 
         if available:
             print(f"Available models: {available}")
-            _cached_model = available[0]
+            _remember_model(available[0])
             return available[0]
 
         print("No models available.")
-        return "ERROR: No models available that support 'generateContent'."
+        return _remember_failure(
+            "ERROR: No models available that support 'generateContent'.", failure
+        )
 
     except Exception as e:
         print(f"Error listing models: {e}")
-        return f"ERROR: Could not list models from Gemini. Details: {e}"
+        return _remember_failure(
+            f"ERROR: Could not list models from Gemini. Details: {e}", failure
+        )
+
+
+def warm_up_model_cache():
+    """
+    Resolve the model once (e.g. at startup) so the first user request does
+    not pay for the model-listing round-trip.
+    """
+    return _get_available_model()
 
 
-def generate_ai_analysis(prompt):
+def _response_cache_key(model_name, prompt, generation_config=None):
+    """
+    Content-addressed key: identical model + prompt (+ config) share a key.
+    """
+    payload = json.dumps(
+        [model_name, prompt, generation_config], sort_keys=True, default=str
+    )
+    return "ai:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _record_cache_result(hit):
+    with _cache_stats_lock:
+        _cache_stats["hits" if hit else "misses"] += 1
+    AI_CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+
+
+def get_cache_stats():
+    """
+    Hit/miss counters of the response cache for this process.
+    """
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
+
+
+def _get_circuit_breaker():
+    global _circuit_breaker
+
+    with _circuit_breaker_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failure_threshold=settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.GEMINI_CIRCUIT_RESET_SECONDS,
+            )
+        return _circuit_breaker
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class AIBackend:
+    """
+    Interface for the provider behind generate_ai_analysis and friends.
+
+    Backends only talk to the model; caching, retries, the circuit breaker
+    and the async concurrency limit are applied around them by this module.
+    Transient failures should be raised as one of TRANSIENT_ERRORS.
+    """
+
+    name = ""
+
+    def select_model(self):
+        """Return the model name to use, or raise AIConfigurationError."""
+        raise NotImplementedError
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        """Return the full response text for `prompt`."""
+        raise NotImplementedError
+
+    def stream(self, model_name, prompt, timeout=None):
+        """Yield response text chunks; defaults to a single chunk."""
+        yield self.generate(model_name, prompt, timeout=timeout)
+
+    async def aselect_model(self):
+        return await asyncio.to_thread(self.select_model)
+
+    async def agenerate(self, model_name, prompt, generation_config=None):
+        return await asyncio.to_thread(self.generate, model_name, prompt, generation_config)
+
+
+class GeminiBackend(AIBackend):
+    """
+    Live Google Gemini via google.generativeai.
+    """
+
+    name = "gemini"
+
+    def select_model(self):
+        if not GEMINI_API_KEY:
+            raise AIConfigurationError("No Gemini API key configured.")
+
+        model_name = _get_available_model()
+
+        if not model_name or model_name.startswith("ERROR:"):
+            raise AIConfigurationError(
+                (model_name or "").replace("ERROR: ", "")
+                or "No supported Gemini model available. Please ensure your API key is correct "
+                "and that you have access to a model that supports 'generateContent'."
+            )
+
+        return model_name
+
+    async def aselect_model(self):
+        if not GEMINI_API_KEY:
+            raise AIConfigurationError("No Gemini API key configured.")
+
+        model_name = await _aget_available_model()
+        if model_name and not model_name.startswith("ERROR:"):
+            return model_name
+
+        return await asyncio.to_thread(self.select_model)
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        model = genai.GenerativeModel(model_name)
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": timeout},
+        )
+        return _response_text(response)
+
+    def stream(self, model_name, prompt, timeout=None):
+        model = genai.GenerativeModel(model_name)
+        for chunk in model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            # The last chunk carries the usage totals.
+            _report_response_usage(chunk)
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+    async def agenerate(self, model_name, prompt, generation_config=None):
+        model = genai.GenerativeModel(model_name)
+        response = await model.generate_content_async(
+            prompt, generation_config=generation_config
+        )
+        return _response_text(response)
+
+
+AI_BACKENDS = {
+    "gemini": "core.services.ai_client.GeminiBackend",
+    "local": "core.services.ai_backends.LocalBackend",
+    "replay": "core.services.ai_backends.ReplayBackend",
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The backend selected by settings.AI_BACKEND: a short name from
+    AI_BACKENDS or a dotted path to an AIBackend subclass.
+    """
+    path = AI_BACKENDS.get(settings.AI_BACKEND, settings.AI_BACKEND)
+
+    with _backends_lock:
+        backend = _backends.get(path)
+        if backend is None:
+            backend = import_string(path)()
+            _backends[path] = backend
+        return backend
+
+
+def _as_ai_error(error):
+    if isinstance(error, (google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout, TimeoutError)):
+        return AITimeoutError(f"Gemini request timed out: {error}")
+    if isinstance(error, TRANSIENT_ERRORS):
+        return AIUnavailableError(f"Gemini is unavailable: {error}")
+    return AIError(f"Gemini request failed: {error}")
+
+
+def _response_text(response):
+    _report_response_usage(response)
+    try:
+        text = response.text
+    except (AttributeError, ValueError) as e:
+        raise AIResponseError(f"No text response from model: {e}") from e
+
+    if not text:
+        raise AIResponseError("No text response from model.")
+    return text
+
+
+# -------------------------------
+# Usage Accounting
+# -------------------------------
+class AICall:
+    """
+    Accounting record of one generate/stream call: model, token counts and
+    wall-clock latency (retries included). Token counts come from the
+    provider's usage metadata when the backend reports it, otherwise they
+    are estimated locally (`estimated`). Cache hits cost no tokens.
+    """
+
+    def __init__(self, purpose, backend_name, model_name):
+        self.purpose = purpose
+        self.backend_name = backend_name
+        self.model_name = model_name
+        self.prompt_tokens = None
+        self.response_tokens = None
+        self.latency_ms = 0
+        self.cached = False
+        self.estimated = False
+        self.outcome = "ok"
+        # Size of the prompt, known for cache hits too (prompt_tokens is 0 there)
+        self.prompt_size = 0
+        # The response text, kept only until its tokens have been counted
+        self.response_text = ""
+
+    @property
+    def total_tokens(self):
+        return (self.prompt_tokens or 0) + (self.response_tokens or 0)
+
+    def __repr__(self):
+        return f"<AICall {self.purpose} {self.model_name} {self.total_tokens} tokens {self.latency_ms}ms>"
+
+
+# Calls made while track_ai_calls() is active, and the call in progress
+_tracked_calls = contextvars.ContextVar("planix_tracked_ai_calls", default=None)
+_current_call = contextvars.ContextVar("planix_current_ai_call", default=None)
+
+
+@contextmanager
+def track_ai_calls():
+    """
+    Collect an AICall for every model call made inside the block (in this
+    thread or task) into the yielded list.
+    """
+    calls = []
+    token = _tracked_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _tracked_calls.reset(token)
+
+
+# RateLimiter applied to provider calls made in this thread (see throttle_ai_calls)
+_rate_limiter = contextvars.ContextVar("planix_ai_rate_limiter", default=None)
+
+
+@contextmanager
+def throttle_ai_calls(limiter):
+    """
+    Make every provider call inside the block, retries included, wait for
+    a slot of `limiter` (a resilience.RateLimiter). Cache hits are free.
+    """
+    token = _rate_limiter.set(limiter)
+    try:
+        yield limiter
+    finally:
+        _rate_limiter.reset(token)
+
+
+def report_usage(prompt_tokens, response_tokens):
+    """
+    For backends: token counts of the call in progress, as billed by the provider.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.prompt_tokens = prompt_tokens
+        call.response_tokens = response_tokens
+
+
+def _report_response_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None) or 0
+    if isinstance(prompt_tokens, int) and prompt_tokens and isinstance(response_tokens, int):
+        report_usage(prompt_tokens, response_tokens)
+
+
+def _track(call):
+    calls = _tracked_calls.get()
+    if calls is not None:
+        calls.append(call)
+
+
+def _track_cache_hit(purpose, backend, model_name, prompt):
+    call = AICall(purpose, backend.name, model_name)
+    call.cached = True
+    call.prompt_tokens = call.response_tokens = 0
+    call.prompt_size = estimate_tokens(prompt)
+    _track(call)
+
+
+_AI_OUTCOMES = {
+    AITimeoutError: "timeout",
+    AIUnavailableError: "unavailable",
+    AIResponseError: "bad_response",
+    AIConfigurationError: "not_configured",
+}
+
+
+@contextmanager
+def _observe_ai_call(backend, model_name, prompt, purpose):
+    """
+    Time a model call (all retries included) for the metrics and the
+    tracked AICall. The AICall is yielded; set its `response_text` so token
+    counts can be estimated when the backend reports no usage.
+    """
+    call = AICall(purpose, backend.name, model_name)
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except AIError as e:
+        call.outcome = _AI_OUTCOMES.get(type(e), "error")
+        raise
+    except GeneratorExit:
+        call.outcome = "cancelled"
+        raise
+    finally:
+        _current_call.reset(token)
+        elapsed = time.perf_counter() - started
+        AI_CALL_LATENCY.observe(elapsed, backend=backend.name, outcome=call.outcome)
+
+        call.latency_ms = round(elapsed * 1000)
+        if call.prompt_tokens is None:
+            call.estimated = True
+            call.prompt_tokens = estimate_tokens(prompt)
+            call.response_tokens = estimate_tokens(call.response_text)
+        call.prompt_size = call.prompt_tokens
+        call.response_text = ""
+        _track(call)
+
+
+def _call_with_resilience(call, timeout=None):
+    """
+    Run `call(timeout)` behind the circuit breaker, retrying transient
+    provider errors with jittered exponential backoff.
+    """
+    if timeout is None:
+        timeout = settings.GEMINI_TIMEOUT
+
+    breaker = _get_circuit_breaker()
+    if not breaker.allow():
+        raise AIUnavailableError("Gemini circuit breaker is open; failing fast.")
+
+    limiter = _rate_limiter.get()
+    attempts = settings.GEMINI_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            result = call(timeout)
+        except TRANSIENT_ERRORS as e:
+            if attempt + 1 < attempts:
+                time.sleep(backoff_delay(attempt, settings.GEMINI_RETRY_BACKOFF, settings.GEMINI_RETRY_BACKOFF_MAX))
+                continue
+            breaker.record_failure()
+            raise _as_ai_error(e) from e
+        except AIError:
+            breaker.record_success()
+            raise
+        except Exception as e:
+            # The provider answered (e.g. invalid argument); not an outage.
+            breaker.record_success()
+            raise _as_ai_error(e) from e
+
+        breaker.record_success()
+        return result
+
+
+def generate_ai_analysis(prompt, generation_config=None, use_cache=True, timeout=None, purpose="analysis"):
     """
 SYSTEM ARCHITECTURE
 - Multi-tier architecture with presentation, application, and data layers
@@ -94,23 +581,235 @@ SECURITY TESTING PLAN
 - Red-team simulation and reporting cycle
 """
 
+    # Failures raise AIError subclasses; `timeout` overrides GEMINI_TIMEOUT.
+    # Each call is recorded for track_ai_calls() under `purpose`.
+    backend = get_backend()
+    model_name = backend.select_model()
+
+    # Responses are cached per model + prompt; pass use_cache=False to force a fresh call.
+    cache = caches[AI_CACHE_ALIAS]
+    cache_key = _response_cache_key(model_name, prompt, generation_config)
+
+    if use_cache:
+        cached = cache.get(cache_key)
+        _record_cache_result(cached is not None)
+        if cached is not None:
+            _track_cache_hit(purpose, backend, model_name, prompt)
+            return cached
+
+    def call(deadline):
+        return backend.generate(model_name, prompt, generation_config, deadline)
+
+    with _observe_ai_call(backend, model_name, prompt, purpose) as observed:
+        text = observed.response_text = _call_with_resilience(call, timeout)
+    cache.set(cache_key, text)
+    return text
+
+
+def parse_json_envelope(text):
+    """
+    Parse a JSON object out of a model response, tolerating markdown code
+    fences around it. Returns None if the text is not a JSON object.
+    """
+    if not text:
+        return None
+
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+
+    return data if isinstance(data, dict) else None
+
+
+def generate_structured_analysis(prompt, use_cache=True):
+    """
+    Ask the model for a single JSON object (Gemini JSON mode) and return it
+    as a dict, or None if the reply was not valid JSON. AIError propagates.
+    """
+    response = generate_ai_analysis(
+        prompt,
+        generation_config={"response_mime_type": "application/json"},
+        use_cache=use_cache,
+        purpose="combined",
+    )
+
+    return parse_json_envelope(response)
+
+
+def stream_ai_analysis(prompt, use_cache=True, timeout=None, purpose="analysis"):
+    """
+    Streaming counterpart of generate_ai_analysis: yields text chunks as the
+    model produces them. A cached reply is yielded as a single chunk, and a
+    completed stream is stored in the response cache.
+
+    Raises AIError like generate_ai_analysis. Nothing is retried once the
+    first chunk has been yielded.
+    """
+    if timeout is None:
+        timeout = settings.GEMINI_TIMEOUT
+
+    backend = get_backend()
+    model_name = backend.select_model()
+
+    cache = caches[AI_CACHE_ALIAS]
+    cache_key = _response_cache_key(model_name, prompt)
+
+    if use_cache:
+        cached = cache.get(cache_key)
+        _record_cache_result(cached is not None)
+        if cached is not None:
+            _track_cache_hit(purpose, backend, model_name, prompt)
+            yield cached
+            return
+
+    with _observe_ai_call(backend, model_name, prompt, purpose) as observed:
+        breaker = _get_circuit_breaker()
+        if not breaker.allow():
+            raise AIUnavailableError("Gemini circuit breaker is open; failing fast.")
+
+        chunks = []
+        try:
+            for text in backend.stream(model_name, prompt, timeout):
+                chunks.append(text)
+                yield text
+        except TRANSIENT_ERRORS as e:
+            breaker.record_failure()
+            raise _as_ai_error(e) from e
+        except Exception as e:
+            breaker.record_success()
+            raise _as_ai_error(e) from e
+
+        breaker.record_success()
+
+        if not chunks:
+            raise AIResponseError("No text response from model.")
+        observed.response_text = "".join(chunks)
+
+    cache.set(cache_key, observed.response_text)
 
-    if not GEMINI_API_KEY:
-        return "ERROR: No Gemini API key configured."
 
-    model_name = _get_available_model()
+# -------------------------------
+# Async Client
+# -------------------------------
+def _get_async_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        _async_semaphores[loop] = semaphore
+    return semaphore
 
-    if not model_name or model_name.startswith("ERROR:"):
-        return model_name or "ERROR: No supported Gemini model available. Please ensure your API key is correct and that you have access to a model that supports 'generateContent'."
 
+async def _aget_available_model():
+    """
+    Async counterpart of _get_available_model. Model listing happens at most
+    once per process, so it is delegated to a thread instead of blocking the loop.
+    """
+    local = _local_cached_model()
+    if local:
+        return local
+
+    return await asyncio.to_thread(_get_available_model)
+
+
+async def _acquire_slot(semaphore):
+    """
+    Wait up to GEMINI_QUEUE_TIMEOUT for a concurrency slot. Running out of
+    time here is local congestion, not a provider failure, so the circuit
+    breaker is left alone.
+    """
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
+        await asyncio.wait_for(semaphore.acquire(), settings.GEMINI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError as e:
+        raise AIUnavailableError(
+            f"No Gemini request slot freed up within {settings.GEMINI_QUEUE_TIMEOUT}s."
+        ) from e
+
 
-        if hasattr(response, "text"):
-            return response.text
+async def _acall_with_resilience(call, timeout=None):
+    """
+    Async counterpart of _call_with_resilience; `call()` returns a coroutine
+    and the deadline is enforced with asyncio.wait_for. Each attempt first
+    takes a slot of the per-loop semaphore, so only the provider call itself
+    counts against `timeout`.
+    """
+    if timeout is None:
+        timeout = settings.GEMINI_TIMEOUT
 
-        return "ERROR: No text response from model."
+    breaker = _get_circuit_breaker()
+    if not breaker.allow():
+        raise AIUnavailableError("Gemini circuit breaker is open; failing fast.")
 
-    except Exception as e:
-        return f"AI Error: {str(e)}"
+    semaphore = _get_async_semaphore()
+    attempts = settings.GEMINI_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        await _acquire_slot(semaphore)
+        try:
+            try:
+                result = await asyncio.wait_for(call(), timeout)
+            finally:
+                semaphore.release()
+        except TRANSIENT_ERRORS + (asyncio.TimeoutError,) as e:
+            if attempt + 1 < attempts:
+                await asyncio.sleep(backoff_delay(attempt, settings.GEMINI_RETRY_BACKOFF, settings.GEMINI_RETRY_BACKOFF_MAX))
+                continue
+            breaker.record_failure()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AITimeoutError(f"Gemini request timed out after {timeout}s") from e
+            raise _as_ai_error(e) from e
+        except AIError:
+            breaker.record_success()
+            raise
+        except Exception as e:
+            breaker.record_success()
+            raise _as_ai_error(e) from e
+
+        breaker.record_success()
+        return result
+
+
+async def agenerate_ai_analysis(prompt, generation_config=None, use_cache=True, timeout=None, purpose="analysis"):
+    """
+    Async counterpart of generate_ai_analysis. Requests go through the SDK's
+    shared async gRPC client (one pooled channel per process, for the Gemini
+    backend) and at most GEMINI_MAX_CONCURRENCY of them are in flight per
+    event loop; waiting for a slot does not count against `timeout`.
+    """
+    backend = get_backend()
+    model_name = await backend.aselect_model()
+
+    cache = caches[AI_CACHE_ALIAS]
+    cache_key = _response_cache_key(model_name, prompt, generation_config)
+
+    if use_cache:
+        cached = await cache.aget(cache_key)
+        _record_cache_result(cached is not None)
+        if cached is not None:
+            _track_cache_hit(purpose, backend, model_name, prompt)
+            return cached
+
+    def call():
+        return backend.agenerate(model_name, prompt, generation_config)
+
+    with _observe_ai_call(backend, model_name, prompt, purpose) as observed:
+        text = observed.response_text = await _acall_with_resilience(call, timeout)
+    await cache.aset(cache_key, text)
+    return text
+
+
+async def agenerate_structured_analysis(prompt, use_cache=True):
+    response = await agenerate_ai_analysis(
+        prompt,
+        generation_config={"response_mime_type": "application/json"},
+        use_cache=use_cache,
+        purpose="combined",
+    )
+
+    return parse_json_envelope(response)
@@ -0,0 +1,294 @@
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.models.analysis_job import AnalysisJob
+from core.models.batch_analysis_job import BatchAnalysisJob
+from core.models.project import Project
+from core.services.analysis_pipeline import run_analysis
+from core.services.batch_analysis import analyze_projects
+from core.services.pdf_reports import prerender_pdf
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Lazily start the in-process worker pool shared by all requests.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYSIS_WORKERS,
+                thread_name_prefix="planix-analysis",
+            )
+        return _executor
+
+
+def enqueue_analysis(project, user):
+    """
+    Persist a pending job and hand it to the worker pool once committed.
+    """
+    job = AnalysisJob.objects.create(project=project, user=user)
+
+    if settings.ANALYSIS_JOBS_EAGER:
+        run_job(job.id)
+        job.refresh_from_db()
+        return job
+
+    transaction.on_commit(lambda: _get_executor().submit(_run_job_in_thread, job.id))
+    return job
+
+
+def active_batch_job(user):
+    return BatchAnalysisJob.objects.filter(
+        user=user, status__in=[AnalysisJob.STATUS_PENDING, AnalysisJob.STATUS_RUNNING]
+    ).first()
+
+
+def enqueue_batch_analysis(user, scope=BatchAnalysisJob.SCOPE_OWN):
+    """
+    Queue a bulk re-analysis of the user's projects (or of every project for
+    SCOPE_ALL); it runs on the same workers as single analyses.
+
+    A user has at most one queued or running batch: returns (job, created),
+    where job is the already active batch if there is one.
+    """
+    try:
+        with transaction.atomic():
+            job = BatchAnalysisJob.objects.create(user=user, scope=scope)
+    except IntegrityError:
+        existing = active_batch_job(user)
+        if existing is None:
+            raise
+        return existing, False
+
+    if settings.ANALYSIS_JOBS_EAGER:
+        run_batch_job(job.id)
+        job.refresh_from_db()
+        return job, True
+
+    transaction.on_commit(lambda: _get_executor().submit(_in_worker_thread, run_batch_job, job.id))
+    return job, True
+
+
+def _claim_job(job_id, model=AnalysisJob):
+    """
+    Atomically move a job from pending to running so that only one worker
+    (thread or `run_analysis_jobs` process) ever executes it.
+    """
+    now = timezone.now()
+    claimed = model.objects.filter(id=job_id, status=AnalysisJob.STATUS_PENDING).update(
+        status=AnalysisJob.STATUS_RUNNING, started_at=now, updated_at=now
+    )
+    return claimed == 1
+
+
+def run_job(job_id):
+    if _claim_job(job_id):
+        _execute_job(job_id)
+
+
+@contextmanager
+def _heartbeat(model, job_id):
+    """
+    Refresh the running job's updated_at every ANALYSIS_JOB_HEARTBEAT_SECONDS
+    from a side thread while the body blocks on the provider, so that a slow
+    generation is not mistaken for a dead worker.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.ANALYSIS_JOB_HEARTBEAT_SECONDS):
+                try:
+                    model.objects.filter(id=job_id, status=AnalysisJob.STATUS_RUNNING).update(
+                        updated_at=timezone.now()
+                    )
+                except Exception as e:
+                    print(f"Heartbeat for job {job_id} failed: {e}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"planix-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _execute_job(job_id):
+    job = AnalysisJob.objects.select_related("project", "user").get(id=job_id)
+
+    try:
+        with _heartbeat(AnalysisJob, job_id):
+            job.analysis = run_analysis(job.project, job.user)
+        job.status = AnalysisJob.STATUS_DONE
+    except Exception as e:
+        print(f"Analysis job {job_id} failed: {e}")
+        job.status = AnalysisJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["analysis", "status", "error", "finished_at", "updated_at"])
+
+    if job.status == AnalysisJob.STATUS_DONE and settings.PDF_PRERENDER:
+        _schedule_pdf_prerender(job.analysis_id)
+
+
+def run_batch_job(job_id):
+    if _claim_job(job_id, BatchAnalysisJob):
+        _execute_batch_job(job_id)
+
+
+class _ClaimLost(Exception):
+    """
+    The batch was requeued (its heartbeat went stale) while this worker was
+    still running it; whoever claims it next carries on.
+    """
+
+
+def _execute_batch_job(job_id):
+    job = BatchAnalysisJob.objects.get(id=job_id)
+
+    projects = Project.objects.all()
+    if job.scope != BatchAnalysisJob.SCOPE_ALL:
+        projects = projects.filter(user_id=job.user_id)
+
+    # Analyses are saved group by group, so a requeued batch only has to
+    # redo the projects that were not analysed yet.
+    projects = projects.exclude(analyses__created_at__gte=job.created_at)
+
+    def heartbeat():
+        alive = BatchAnalysisJob.objects.filter(
+            id=job_id, status=AnalysisJob.STATUS_RUNNING, started_at=job.started_at
+        ).update(updated_at=timezone.now())
+        if not alive:
+            raise _ClaimLost
+
+    try:
+        report = analyze_projects(projects, heartbeat=heartbeat)
+        report["failures"] = [
+            {"project_id": project_id, "error": error}
+            for project_id, error in report["failures"]
+        ]
+        job.report = report
+        job.status = AnalysisJob.STATUS_DONE
+    except _ClaimLost:
+        print(f"Batch analysis job {job_id} was requeued while running; stopping")
+        return
+    except Exception as e:
+        print(f"Batch analysis job {job_id} failed: {e}")
+        job.status = AnalysisJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["report", "status", "error", "finished_at", "updated_at"])
+
+
+def _schedule_pdf_prerender(analysis_id):
+    """
+    Render the PDF while the user is still reading the analysis page, so the
+    first download is served from the cache.
+    """
+    if settings.ANALYSIS_JOBS_EAGER:
+        prerender_pdf(analysis_id)
+    else:
+        _get_executor().submit(_in_worker_thread, prerender_pdf, analysis_id)
+
+
+def _in_worker_thread(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    finally:
+        connection.close()
+
+
+def _run_job_in_thread(job_id):
+    _in_worker_thread(run_job, job_id)
+
+
+def requeue_stale_jobs(max_age_seconds=None):
+    """
+    Reset jobs stuck in 'running' (e.g. the process died mid-generation)
+    back to 'pending' so they can be picked up again. Jobs are judged by
+    their heartbeat, which a live worker refreshes every
+    ANALYSIS_JOB_HEARTBEAT_SECONDS however long the job runs, so work still
+    going on in another process (such as a web process's pool) is left alone.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = settings.ANALYSIS_JOB_STALE_SECONDS
+
+    now = timezone.now()
+    requeued = 0
+    for model in (AnalysisJob, BatchAnalysisJob):
+        requeued += model.objects.filter(
+            status=AnalysisJob.STATUS_RUNNING, updated_at__lt=now - timedelta(seconds=max_age_seconds)
+        ).update(status=AnalysisJob.STATUS_PENDING, started_at=None, updated_at=now)
+    return requeued
+
+
+def fail_stale_job(job):
+    """
+    Mark a running `job` (an AnalysisJob or BatchAnalysisJob) failed if its
+    heartbeat is older than ANALYSIS_JOB_STALE_SECONDS, i.e. the worker
+    running it (such as a web process's in-process pool) died. Pending jobs
+    are left alone however long they have been queued. Returns True if it
+    was marked.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.ANALYSIS_JOB_STALE_SECONDS)
+    marked = type(job).objects.filter(
+        id=job.id,
+        status=AnalysisJob.STATUS_RUNNING,
+        updated_at__lt=cutoff,
+    ).update(
+        status=AnalysisJob.STATUS_FAILED,
+        error="The analysis was interrupted. Please try again.",
+        finished_at=now,
+        updated_at=now,
+    )
+    if marked:
+        job.refresh_from_db()
+    return bool(marked)
+
+
+def _next_pending_job(model):
+    return (
+        model.objects.filter(status=AnalysisJob.STATUS_PENDING)
+        .order_by("created_at")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def process_pending_jobs(limit=None):
+    """
+    Drain pending jobs in the current process, oldest first; single
+    analyses go before batch jobs. Returns the number of jobs this call executed.
+    """
+    processed = 0
+
+    for model, execute in ((AnalysisJob, _execute_job), (BatchAnalysisJob, _execute_batch_job)):
+        while limit is None or processed < limit:
+            job_id = _next_pending_job(model)
+            if job_id is None:
+                break
+
+            # Another worker may have claimed it in the meantime.
+            if _claim_job(job_id, model):
+                execute(job_id)
+                processed += 1
+
+    return processed
@@ -0,0 +1,176 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from core.models.project_analysis import ProjectAnalysis
+from core.models.analysis_report import AnalysisReport
+from core.models.ai_usage import AIUsage
+from core.services.ai_client import generate_ai_analysis, generate_structured_analysis, track_ai_calls
+from core.services.ai_client import agenerate_ai_analysis, agenerate_structured_analysis
+from core.services.security_scoring import calculate_final_security_score, parse_risk_adjustment
+from core.services.security_scoring import acalculate_final_security_score
+from core.services.report_sections import SECTION_FIELDS, parse_sections
+from core.services.prompts import build_analysis_prompt, build_combined_prompt, prompt_stats
+
+
+# -------------------------------
+# Combined Response
+# -------------------------------
+def parse_combined_response(data):
+    """
+    Validate the JSON envelope from build_combined_prompt.
+    Returns (sections, severity) or None if the envelope is unusable.
+    """
+    if not data:
+        return None
+
+    raw_sections = data.get("sections")
+    if not isinstance(raw_sections, dict) or "severity" not in data:
+        return None
+
+    sections = {}
+    for header, field in SECTION_FIELDS:
+        value = raw_sections.get(header)
+        if not isinstance(value, str):
+            return None
+        sections[field] = value.strip()
+
+    return sections, parse_risk_adjustment(data["severity"])
+
+
+# -------------------------------
+# Full Pipeline
+# -------------------------------
+def generate_sections_and_score(project, use_cache=True):
+    """
+    Produce the report sections plus (score, category) for a project.
+
+    Tries one structured round-trip first; if the model does not return a
+    usable JSON envelope, falls back to the report prompt followed by the
+    separate risk-adjustment prompt. AIError propagates so that callers
+    fail fast instead of storing error text as a report.
+    """
+    combined = parse_combined_response(
+        generate_structured_analysis(build_combined_prompt(project), use_cache=use_cache)
+    )
+
+    if combined:
+        sections, severity = combined
+        score, category = calculate_final_security_score(project, ai_adjustment=severity, use_cache=use_cache)
+        return sections, score, category
+
+    generated_text = generate_ai_analysis(build_analysis_prompt(project), use_cache=use_cache)
+
+    # Extract sections
+    sections = parse_sections(generated_text)
+
+    # Apply hybrid security scoring
+    score, category = calculate_final_security_score(project, use_cache=use_cache)
+    return sections, score, category
+
+
+async def agenerate_sections_and_score(project, use_cache=True):
+    """
+    Async counterpart of generate_sections_and_score for ASGI views.
+    """
+    combined = parse_combined_response(
+        await agenerate_structured_analysis(build_combined_prompt(project), use_cache=use_cache)
+    )
+
+    if combined:
+        sections, severity = combined
+        score, category = await acalculate_final_security_score(
+            project, ai_adjustment=severity, use_cache=use_cache
+        )
+        return sections, score, category
+
+    generated_text = await agenerate_ai_analysis(build_analysis_prompt(project), use_cache=use_cache)
+
+    sections = parse_sections(generated_text)
+
+    score, category = await acalculate_final_security_score(project, use_cache=use_cache)
+    return sections, score, category
+
+
+def _analysis_fields(sections):
+    return {field: sections.get(field, "") for _, field in SECTION_FIELDS}
+
+
+def build_analysis(project, user, sections, score, category, ai_calls=(), billed=True):
+    """
+    Unsaved ProjectAnalysis (with its AnalysisReport attached as
+    `analysis.report`) for a finished analysis; `sections` maps field name -> text.
+    `ai_calls` are the AICalls (see track_ai_calls) that produced it; they
+    give the prompt size and, if `billed`, are saved as its AIUsage rows.
+    """
+    analysis = ProjectAnalysis(
+        project=project,
+        user=user,
+        security_score=score,
+        risk_category=category,
+        **prompt_stats(project, ai_calls),
+    )
+    analysis.report = AnalysisReport.build(_analysis_fields(sections))
+    analysis.ai_calls = list(ai_calls) if billed else []
+    return analysis
+
+
+def _save_ai_usage(analyses):
+    AIUsage.objects.bulk_create(
+        AIUsage.from_call(analysis, call)
+        for analysis in analyses
+        for call in getattr(analysis, "ai_calls", ())
+    )
+
+
+def save_analysis(project, user, sections, score, category, ai_calls=()):
+    """
+    Persist a finished analysis; `sections` maps field name -> text.
+    """
+    analysis = build_analysis(project, user, sections, score, category, ai_calls)
+    with transaction.atomic():
+        AnalysisReport.save_sections([analysis.report])
+        analysis.save()
+        analysis.report.save()
+        _save_ai_usage([analysis])
+    return analysis
+
+
+def bulk_save_analyses(analyses, batch_size=500):
+    """
+    bulk_create analyses from build_analysis() together with their reports
+    and AI usage; sections shared between analyses are written once.
+    """
+    with transaction.atomic():
+        AnalysisReport.save_sections([analysis.report for analysis in analyses])
+        created = ProjectAnalysis.objects.bulk_create(analyses, batch_size=batch_size)
+        AnalysisReport.objects.bulk_create(
+            [analysis.report for analysis in created], batch_size=batch_size
+        )
+        _save_ai_usage(created)
+    return created
+
+
+def run_analysis(project, user, use_cache=True):
+    """
+    Generate, score and persist a ProjectAnalysis for the given project.
+    This is the slow path (LLM calls) and is executed by the job workers.
+    """
+    with track_ai_calls() as ai_calls:
+        sections, score, category = generate_sections_and_score(project, use_cache=use_cache)
+
+    # Save analysis
+    return save_analysis(project, user, sections, score, category, ai_calls)
+
+
+async def asave_analysis(project, user, sections, score, category, ai_calls=()):
+    return await sync_to_async(save_analysis)(project, user, sections, score, category, ai_calls)
+
+
+async def arun_analysis(project, user, use_cache=True):
+    """
+    Async counterpart of run_analysis: no thread is held while waiting on Gemini.
+    """
+    with track_ai_calls() as ai_calls:
+        sections, score, category = await agenerate_sections_and_score(project, use_cache=use_cache)
+
+    return await asave_analysis(project, user, sections, score, category, ai_calls)
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from core.services.analysis_pipeline import build_analysis, bulk_save_analyses, generate_sections_and_score
+from core.services.ai_client import throttle_ai_calls, track_ai_calls
+from core.services.resilience import RateLimiter
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(rate_per_minute):
+    """
+    The process-wide RateLimiter for a rate, shared by every batch running
+    in this process so that concurrent batches do not add up their rates.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(rate_per_minute)
+        if limiter is None:
+            limiter = _limiters[rate_per_minute] = RateLimiter(rate_per_minute)
+        return limiter
+
+
+def _prompt_key(project):
+    """
+    Projects with identical inputs produce identical prompts and scores.
+    """
+    return (
+        project.name,
+        project.description,
+        project.platform,
+        project.tech_stack,
+        project.scale,
+        project.budget,
+        project.risk_level,
+    )
+
+
+def analyze_projects(projects, max_workers=None, rate_per_minute=None, use_cache=True, heartbeat=None):
+    """
+    Analyse many projects at once.
+
+    Identical projects are generated once, generation fans out over a bounded
+    thread pool (every provider call, retries included, waits for a slot of
+    the process-wide rate limiter), and each group's rows are written with a
+    bulk_create as soon as it completes, so a crash loses at most the groups
+    in flight. `heartbeat()`, if given, is called after every group and at
+    least every ANALYSIS_JOB_HEARTBEAT_SECONDS; an exception from it cancels
+    the remaining groups. Returns a report dict with throughput and
+    per-project failures.
+    """
+    if max_workers is None:
+        max_workers = settings.BATCH_ANALYSIS_WORKERS
+    if rate_per_minute is None:
+        rate_per_minute = settings.BATCH_ANALYSIS_RATE_PER_MINUTE
+
+    started = time.monotonic()
+    projects = list(projects.select_related("user"))
+
+    groups = {}
+    for project in projects:
+        groups.setdefault(_prompt_key(project), []).append(project)
+
+    limiter = get_rate_limiter(rate_per_minute)
+
+    def generate(project):
+        with throttle_ai_calls(limiter), track_ai_calls() as ai_calls:
+            return generate_sections_and_score(project, use_cache=use_cache), ai_calls
+
+    created = 0
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planix-batch") as pool:
+        futures = {pool.submit(generate, group[0]): group for group in groups.values()}
+        pending = set(futures)
+
+        try:
+            while pending:
+                done, pending = wait(
+                    pending, timeout=settings.ANALYSIS_JOB_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    group = futures[future]
+                    try:
+                        (sections, score, category), ai_calls = future.result()
+                    except Exception as e:
+                        failures.extend((project.id, str(e)) for project in group)
+                        continue
+
+                    # The calls are billed once, to the first analysis of the group.
+                    created += len(bulk_save_analyses([
+                        build_analysis(project, project.user, sections, score, category,
+                                       ai_calls, billed=i == 0)
+                        for i, project in enumerate(group)
+                    ]))
+
+                if heartbeat is not None:
+                    heartbeat()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    elapsed = time.monotonic() - started
+    return {
+        "projects": len(projects),
+        "unique_prompts": len(groups),
+        "created": created,
+        "failures": failures,
+        "elapsed_seconds": round(elapsed, 3),
+        "projects_per_minute": round(len(projects) / elapsed * 60, 2) if elapsed else 0.0,
+    }
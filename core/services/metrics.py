@@ -0,0 +1,171 @@
+"""
+In-process metrics rendered in the Prometheus text format on /metrics.
+
+Values live in the memory of the process that recorded them: each worker
+process exposes its own series, there is no aggregation across processes.
+"""
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+
+INF = math.inf
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, INF)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, INF)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, INF)
+
+_registry = []
+
+
+def _format_value(value):
+    if value == INF:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for key, value in series:
+                lines.extend(self._render_series(list(zip(self.labelnames, key)), value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, pairs, value):
+        return [f"{self.name}_total{_format_labels(pairs)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) if buckets[-1] == INF else tuple(buckets) + (INF,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series["count"] if series else 0
+
+    def time(self, **labels):
+        """
+        Context manager / decorator observing the elapsed wall time in seconds.
+        """
+        return _Timer(self, labels)
+
+    def _render_series(self, pairs, series):
+        lines = [
+            f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {count}"
+            for bound, count in zip(self.buckets, series["buckets"])
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(pairs)} {series['count']}")
+        return lines
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+        return False
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+REQUEST_LATENCY = Histogram(
+    "planix_request_duration_seconds", "Time spent handling a request, by view.",
+    ["view", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "planix_request_db_queries", "Database queries executed per request, by view.",
+    ["view"], buckets=COUNT_BUCKETS,
+)
+AI_CALL_LATENCY = Histogram(
+    "planix_ai_call_duration_seconds", "Model calls including retries, by backend and outcome.",
+    ["backend", "outcome"],
+)
+AI_CACHE_LOOKUPS = Counter(
+    "planix_ai_cache_lookups", "AI response cache lookups, by result.",
+    ["result"],
+)
+PDF_RENDER_LATENCY = Histogram(
+    "planix_pdf_render_duration_seconds", "PDF renders from submission to stored file.",
+    ["kind", "outcome"],
+)
+EXPORT_SIZE = Histogram(
+    "planix_export_size_bytes", "Size of generated exports, by format.",
+    ["format"], buckets=SIZE_BUCKETS,
+)
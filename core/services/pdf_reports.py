@@ -0,0 +1,273 @@
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.template.loader import get_template, render_to_string
+
+from core.models.analysis_report import prefetch_section_texts
+from core.models.project_analysis import ProjectAnalysis
+from core.services import pdf_worker
+from core.services.metrics import EXPORT_SIZE, PDF_RENDER_LATENCY
+
+PDF_TEMPLATE = "core/analysis_pdf.html"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Cache name -> Future for renders in flight in this process
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+class PdfRenderError(Exception):
+    """Rendering failed, timed out or hit the worker memory cap."""
+
+
+class PdfQueueFull(PdfRenderError):
+    """PDF_QUEUE_SIZE renders are already waiting; try again later."""
+
+
+@lru_cache(maxsize=1)
+def _template_hash():
+    source = get_template(PDF_TEMPLATE).template.source
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+
+def template_version():
+    """
+    PDF_TEMPLATE_VERSION if set, otherwise derived from the template source
+    so editing analysis_pdf.html invalidates every cached PDF.
+    """
+    return settings.PDF_TEMPLATE_VERSION or _template_hash()
+
+
+def pdf_storage():
+    return storages["pdf_reports"]
+
+
+def pdf_cache_name(analysis_id):
+    return f"analysis_{analysis_id}_{template_version()}.pdf"
+
+
+def pdf_etag(analysis_id):
+    return f"{analysis_id}-{template_version()}"
+
+
+def history_pdf_cache_name(project_id, analysis_ids):
+    # Changes whenever an analysis is added to or removed from the history.
+    digest = hashlib.sha256(",".join(map(str, analysis_ids)).encode()).hexdigest()[:12]
+    return f"{_history_prefix(project_id)}{digest}_{template_version()}.pdf"
+
+
+def _history_prefix(project_id):
+    return f"history_{project_id}_"
+
+
+def prune_pdf_cache():
+    """
+    Delete cached PDFs that can no longer be served: other template
+    versions, deleted analyses and superseded history renders.
+    Returns the number of files removed.
+    """
+    storage = pdf_storage()
+    version = template_version()
+    analysis_ids = set(ProjectAnalysis.objects.values_list("id", flat=True))
+    current_history = {
+        history_pdf_cache_name(project_id, ids)
+        for project_id, ids in _history_ids_by_project().items()
+    }
+
+    removed = 0
+    for name in storage.listdir("")[1]:
+        kind, _, rest = name.partition("_")
+        if kind == "analysis":
+            analysis_id = rest.split("_", 1)[0]
+            keep = analysis_id.isdigit() and int(analysis_id) in analysis_ids
+        elif kind == "history":
+            keep = name in current_history
+        else:
+            continue
+        if not keep or not name.endswith(f"_{version}.pdf"):
+            storage.delete(name)
+            removed += 1
+    return removed
+
+
+def _history_ids_by_project():
+    ids = {}
+    rows = ProjectAnalysis.objects.order_by("project_id", "created_at").values_list("project_id", "id")
+    for project_id, analysis_id in rows.iterator(chunk_size=2000):
+        ids.setdefault(project_id, []).append(analysis_id)
+    return ids
+
+
+def analysis_html(analysis):
+    return render_to_string(PDF_TEMPLATE, {
+        "analysis": analysis,
+        "project": analysis.project
+    })
+
+
+# -------------------------------
+# Process pool
+# -------------------------------
+def _get_pool():
+    """
+    Lazily start the bounded pool of rendering processes. Workers are
+    spawned rather than forked: the web process is multi-threaded.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=pdf_worker.init_worker,
+                initargs=(settings.PDF_RENDER_MEMORY_MB,),
+            )
+        return _pool
+
+
+def _reset_pool():
+    """
+    Drop a pool whose worker died (e.g. killed for exceeding its memory);
+    the next render starts a fresh one.
+    """
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _store(name, pdf_file, supersedes=()):
+    storage = pdf_storage()
+    # A concurrent render may have stored it meanwhile; both are identical.
+    if not storage.exists(name):
+        storage.save(name, ContentFile(pdf_file))
+        EXPORT_SIZE.observe(len(pdf_file), format="pdf")
+        for old_name in supersedes:
+            if old_name != name:
+                storage.delete(old_name)
+
+
+def _finish(name, render, future, kind, started, supersedes=()):
+    outcome = "error"
+    try:
+        _store(name, render.result(), supersedes)
+        outcome = "ok"
+        future.set_result(name)
+    except BrokenProcessPool as e:
+        _reset_pool()
+        future.set_exception(PdfRenderError(f"PDF worker crashed: {e}"))
+    except Exception as e:
+        future.set_exception(PdfRenderError(f"PDF rendering failed: {e}"))
+    finally:
+        PDF_RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+        with _pending_lock:
+            _pending.pop(name, None)
+
+
+def request_pdf(name, build_html_documents, kind="analysis", supersedes=()):
+    """
+    Future resolving to the storage name of a rendered PDF.
+
+    Already stored PDFs resolve immediately and concurrent requests for the
+    same name share one render. Otherwise the HTML is built here (it needs
+    the database) and rendered in the process pool; with PDF_WORKERS=0 it is
+    rendered inline. Raises PdfQueueFull when PDF_QUEUE_SIZE renders are
+    already in flight. Once stored, the cached files named in `supersedes`
+    are deleted; anything else stale is left to prune_pdf_cache().
+    """
+    future = Future()
+
+    if pdf_storage().exists(name):
+        future.set_result(name)
+        return future
+
+    started = time.perf_counter()
+
+    if not settings.PDF_WORKERS:
+        outcome = "error"
+        try:
+            _store(name, pdf_worker.render_documents(build_html_documents()), supersedes)
+            outcome = "ok"
+            future.set_result(name)
+        except Exception as e:
+            future.set_exception(PdfRenderError(f"PDF rendering failed: {e}"))
+        PDF_RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+        return future
+
+    with _pending_lock:
+        if name in _pending:
+            return _pending[name]
+        if len(_pending) >= settings.PDF_QUEUE_SIZE:
+            raise PdfQueueFull("Too many PDFs are being rendered.")
+        _pending[name] = future
+
+    try:
+        render = _get_pool().submit(
+            pdf_worker.render, build_html_documents(), settings.PDF_RENDER_TIMEOUT
+        )
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reset_pool()
+        with _pending_lock:
+            _pending.pop(name, None)
+        future.set_exception(PdfRenderError(f"PDF rendering failed: {e}"))
+        return future
+
+    render.add_done_callback(lambda done: _finish(name, done, future, kind, started, supersedes))
+    return future
+
+
+def request_analysis_pdf(analysis):
+    return request_pdf(pdf_cache_name(analysis.id), lambda: [analysis_html(analysis)])
+
+
+def request_history_pdf(project):
+    """
+    One multi-document PDF of a project's whole analysis history, oldest first.
+    """
+    analyses = ProjectAnalysis.objects.filter(project=project).order_by("created_at")
+    analysis_ids = list(analyses.values_list("id", flat=True))
+    name = history_pdf_cache_name(project.id, analysis_ids)
+    # The render from before the latest analysis was added.
+    previous = history_pdf_cache_name(project.id, analysis_ids[:-1])
+
+    def build_html_documents():
+        history = list(analyses.select_related("report"))
+        prefetch_section_texts([a.report for a in history if hasattr(a, "report")])
+        for analysis in history:
+            analysis.project = project
+        return [analysis_html(analysis) for analysis in history]
+
+    return request_pdf(name, build_html_documents, kind="history", supersedes=[previous])
+
+
+def wait_for_pdf(future):
+    """
+    Block until `future` from request_pdf() is done; the pool enforces
+    PDF_RENDER_TIMEOUT, the extra margin covers queueing.
+    """
+    return future.result(timeout=settings.PDF_RENDER_TIMEOUT + settings.PDF_WAIT_SECONDS)
+
+
+def prerender_pdf(analysis_id):
+    """
+    Warm the PDF cache for a freshly generated analysis.
+    """
+    analysis = ProjectAnalysis.objects.select_related("project", "report").get(id=analysis_id)
+    try:
+        wait_for_pdf(request_analysis_pdf(analysis))
+    except Exception as e:
+        print(f"PDF pre-render for analysis {analysis_id} failed: {e}")
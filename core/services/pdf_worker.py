@@ -0,0 +1,56 @@
+"""
+Code that runs inside the PDF rendering processes.
+
+Kept free of Django imports so the (spawned) workers start quickly and stay
+small; weasyprint is only imported in the worker, on first use.
+"""
+import signal
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def init_worker(memory_limit_mb):
+    """
+    Process-pool initializer: cap the worker's address space so one huge
+    document fails with MemoryError instead of exhausting the host.
+    """
+    if resource and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _on_timeout(signum, frame):
+    raise TimeoutError("PDF rendering timed out.")
+
+
+def render_documents(html_documents):
+    """
+    One PDF from one or more HTML documents, pages in order.
+    """
+    from weasyprint import HTML
+
+    if len(html_documents) == 1:
+        return HTML(string=html_documents[0]).write_pdf()
+
+    documents = [HTML(string=html).render() for html in html_documents]
+    pages = [page for document in documents for page in document.pages]
+    return documents[0].copy(pages).write_pdf()
+
+
+def render(html_documents, timeout):
+    """
+    Pool entry point: render_documents() aborted after `timeout` seconds.
+    """
+    if not timeout or not hasattr(signal, "SIGALRM"):
+        return render_documents(html_documents)
+
+    previous = signal.signal(signal.SIGALRM, _on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return render_documents(html_documents)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,156 @@
+import re
+
+from django.conf import settings
+
+from core.services.report_sections import SECTION_FIELDS
+
+# Rough local estimate: English text averages ~4 characters per token.
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = " [...truncated]"
+
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+
+# -------------------------------
+# Templates
+# -------------------------------
+PROJECT_DETAILS = """Name: {name}
+Description: {description}
+Platform: {platform}
+Tech Stack: {tech_stack}
+Scale: {scale}
+Budget: {budget}
+Risk Level: {risk_level}"""
+
+# Enhanced prompt with EXECUTIVE SUMMARY section
+ANALYSIS_PROMPT = """
+You are a security architect AI. Generate a structured secure system analysis for the following project:
+
+{details}
+
+Your response must contain sections with EXACT HEADERS:
+
+EXECUTIVE SUMMARY
+SYSTEM ARCHITECTURE
+THREAT MODEL
+SECURE SDLC
+COST ESTIMATION
+SECURITY TESTING PLAN
+
+EXECUTIVE SUMMARY must include:
+- Overall security posture (1–2 sentences)
+- Top 3 critical risks
+- Immediate actions recommended
+
+Make sure each section begins with its header in uppercase.
+"""
+
+_SECTION_KEYS = ",\n".join(f'    "{header}": "..."' for header, _ in SECTION_FIELDS)
+
+COMBINED_SUFFIX = """
+Additionally rate the security risk severity of this system on a scale from 1 to 10.
+
+Return ONLY a JSON object with this exact shape, no markdown:
+{
+  "sections": {
+%s
+  },
+  "severity": <integer 1-10>
+}
+""" % _SECTION_KEYS
+
+RISK_PROMPT = """
+Rate the security risk severity of this system on a scale from 1 to 10.
+Return ONLY a number, no words.
+
+System Details:
+{details}
+"""
+
+
+# -------------------------------
+# Token budgeting
+# -------------------------------
+def estimate_tokens(text):
+    """
+    Local token estimate (no tokenizer round-trip), rounded up.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def fit_to_budget(text, max_tokens):
+    """
+    Return (text, truncated) with `text` condensed and, if still needed,
+    cut at a word boundary so that it fits in roughly `max_tokens`.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+
+    # Pasted documents are often mostly indentation and blank lines.
+    condensed = _WHITESPACE_RUN.sub(" ", text).strip()
+    if estimate_tokens(condensed) <= max_tokens:
+        return condensed, True
+
+    limit = max(max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER), 0)
+    cut = condensed[:limit]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + TRUNCATION_MARKER, True
+
+
+def project_details(project):
+    """
+    The "System Details" block shared by every prompt, with the description
+    held to PROMPT_DESCRIPTION_MAX_TOKENS. The other text fields are capped
+    at 255 characters by the model, so they are sent as is. Returns
+    (details, truncated).
+    """
+    description, truncated = fit_to_budget(project.description, settings.PROMPT_DESCRIPTION_MAX_TOKENS)
+
+    details = PROJECT_DETAILS.format(
+        name=project.name,
+        description=description,
+        platform=project.platform,
+        tech_stack=project.tech_stack,
+        scale=project.scale,
+        budget=project.budget,
+        risk_level=project.risk_level,
+    )
+    return details, truncated
+
+
+# -------------------------------
+# Prompts
+# -------------------------------
+def build_analysis_prompt(project):
+    return ANALYSIS_PROMPT.format(details=project_details(project)[0])
+
+
+def build_combined_prompt(project):
+    """
+    Single-call variant: the report sections and the 1-10 severity rating
+    used by calculate_final_security_score, returned as one JSON object.
+    """
+    return build_analysis_prompt(project) + COMBINED_SUFFIX
+
+
+def build_risk_prompt(project):
+    return RISK_PROMPT.format(details=project_details(project)[0])
+
+
+def prompt_stats(project, ai_calls=()):
+    """
+    {"prompt_tokens", "prompt_truncated"} as stored on ProjectAnalysis.
+
+    `ai_calls` are the AICalls that produced the analysis; prompt_tokens is
+    the size of the prompts they sent (whichever path was taken, cache hits
+    included). Without tracked calls it falls back to an estimate of the
+    combined prompt.
+    """
+    details, truncated = project_details(project)
+    if ai_calls:
+        prompt_tokens = sum(call.prompt_size for call in ai_calls)
+    else:
+        prompt_tokens = estimate_tokens(ANALYSIS_PROMPT.format(details=details) + COMBINED_SUFFIX)
+    return {"prompt_tokens": prompt_tokens, "prompt_truncated": truncated}
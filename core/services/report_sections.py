@@ -0,0 +1,221 @@
+import re
+
+# Report header -> ProjectAnalysis field
+SECTION_FIELDS = [
+    ("EXECUTIVE SUMMARY", "executive_summary"),
+    ("SYSTEM ARCHITECTURE", "architecture"),
+    ("THREAT MODEL", "threat_model"),
+    ("SECURE SDLC", "sdls_recommendations"),
+    ("COST ESTIMATION", "cost_estimation"),
+    ("SECURITY TESTING PLAN", "testing_plan"),
+]
+
+SECTION_HEADERS = dict(SECTION_FIELDS)
+
+_HEADER_ALTERNATIVES = "|".join(re.escape(header) for header, _ in SECTION_FIELDS)
+
+# Words a model may append to a header: up to three capitalised words
+# ("SECURE SDLC PLAN", "Threat Model Overview") and/or a parenthetical
+# ("THREAT MODEL (STRIDE + OWASP)"). Case-sensitive so that body text such
+# as "Threat model reviews happen weekly" is not taken for a header.
+_HEADER_SUFFIX = r"(?-i:(?:[ \t]+[A-Z][A-Za-z&/+-]*){0,3})(?:[ \t]*\([^)\n]*\))?"
+
+# A line holding only a section header, tolerating markdown headings, bold or
+# italics, list numbering ("1.", "2)"), a trailing suffix and a trailing
+# colon. Content may follow the colon on the same line.
+_HEADER_LINE_PATTERN = (
+    r"(?P<prefix>[ \t]*(?:#{1,6}[ \t]*)?[*_]{0,3}[ \t]*(?:\d{1,2}[.)][ \t]*)?[*_]{0,3})[ \t]*"
+    r"(?P<header>" + _HEADER_ALTERNATIVES + r")" + _HEADER_SUFFIX +
+    r"[ \t]*[*_]{0,3}[ \t]*(?::[ \t]*[*_]{0,3}[ \t]*(?P<rest>.*?))?[ \t]*\r?"
+)
+_HEADER_LINE = re.compile(_HEADER_LINE_PATTERN, re.IGNORECASE)
+
+# Cheap test for lines that may be headers; hits are then checked against
+# _HEADER_LINE. The leading newline lets the regex engine jump from line to
+# line instead of trying every position in the report.
+_CANDIDATE_PREFIX = r"[ \t#*_\d.)]*(?:" + _HEADER_ALTERNATIVES + r")"
+_FIRST_LINE_CANDIDATE = re.compile(_CANDIDATE_PREFIX, re.IGNORECASE)
+_LINE_CANDIDATE = re.compile(r"\n" + _CANDIDATE_PREFIX, re.IGNORECASE)
+
+
+def _candidate_line_starts(text):
+    starts = [match.start() + 1 for match in _LINE_CANDIDATE.finditer(text)]
+    if _FIRST_LINE_CANDIDATE.match(text):
+        starts.insert(0, 0)
+    return starts
+
+
+def _header_of(match):
+    """
+    (header, inline content) for a _HEADER_LINE match, or None if the
+    line reads as body text: "Cost estimation: roughly $50k" is a sentence,
+    while "COST ESTIMATION: ..." and "**Cost Estimation:** ..." are headers.
+    """
+    header, rest = match.group("header"), match.group("rest") or ""
+    if rest and not (header.isupper() or match.group("prefix").strip()):
+        return None
+    return header.upper(), rest
+
+
+def _keep(sections, field, content):
+    """
+    A repeated header (a recap, or a header-like line in another section)
+    replaces the earlier text only if it carries more of it.
+    """
+    return field not in sections or len(content) > len(sections[field])
+
+
+# -------------------------------
+# Section Parser
+# -------------------------------
+def parse_sections(text):
+    """
+    Split a generated report into {field: content} in a single scan.
+
+    Each section runs up to the nearest following header line; if a header
+    appears twice the longer section wins. Fields whose header is missing
+    are left out.
+    """
+    headers = []  # (line start, content start, header, inline content)
+
+    for start in _candidate_line_starts(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+
+        line = text[start:end]
+        header = line.strip()
+        if header in SECTION_HEADERS:
+            # Plain "THREAT MODEL" lines, the usual case, skip the regex.
+            headers.append((start, end, header, ""))
+            continue
+
+        split = split_header_line(line)
+        if split is not None:
+            headers.append((start, end, *split))
+
+    sections = {}
+
+    for i, (_, content_start, header, rest) in enumerate(headers):
+        content_end = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+        content = text[content_start:content_end]
+        if rest:
+            content = rest + content
+        content = content.strip()
+
+        field = SECTION_HEADERS[header]
+        if _keep(sections, field, content):
+            sections[field] = content
+
+    return sections
+
+
+def extract_section(text, header):
+    """
+    Extract content under a section header until the next known header.
+
+    Legacy per-header extractor, superseded by parse_sections() and kept
+    for comparison in the `benchmark_section_parser` command.
+    """
+    if header not in text:
+        return ""
+
+    section = text.split(header, 1)[1]
+
+    NEXT_HEADERS = [
+        "EXECUTIVE SUMMARY",
+        "SYSTEM ARCHITECTURE",
+        "THREAT MODEL",
+        "SECURE SDLC",
+        "COST ESTIMATION",
+        "SECURITY TESTING PLAN",
+    ]
+
+    for next_header in NEXT_HEADERS:
+        if next_header in section and next_header != header:
+            section = section.split(next_header, 1)[0]
+            break
+
+    return section.strip()
+
+
+# -------------------------------
+# Incremental Parser (streaming)
+# -------------------------------
+def split_header_line(line):
+    """
+    (header, inline content) if the line is a section header as recognised
+    by parse_sections(), otherwise None.
+    """
+    # Plain "THREAT MODEL" lines, the usual case, skip the regex.
+    header = line.strip()
+    if header in SECTION_HEADERS:
+        return header, ""
+
+    match = _HEADER_LINE.fullmatch(line.rstrip("\r\n"))
+    if match is None:
+        return None
+    return _header_of(match)
+
+
+class SectionStreamParser:
+    """
+    Consume model output chunk by chunk and emit each section as soon as
+    the next header (or the end of the stream) closes it.
+
+    feed() and close() return a list of (header, field, content) tuples;
+    `sections` holds everything completed so far keyed by field name.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._header = None
+        self._lines = []
+        self.sections = {}
+
+    def feed(self, chunk):
+        self._pending += chunk
+        if "\n" not in self._pending:
+            return []
+
+        complete, self._pending = self._pending.rsplit("\n", 1)
+        completed = []
+        for line in complete.split("\n"):
+            completed.extend(self._consume_line(line))
+        return completed
+
+    def close(self):
+        completed = []
+        if self._pending:
+            completed.extend(self._consume_line(self._pending))
+            self._pending = ""
+        completed.extend(self._finish_section())
+        return completed
+
+    def _consume_line(self, line):
+        split = split_header_line(line)
+        if split is None:
+            if self._header is not None:
+                self._lines.append(line)
+            return []
+
+        completed = self._finish_section()
+        self._header, rest = split
+        self._lines = [rest] if rest else []
+        return completed
+
+    def _finish_section(self):
+        if self._header is None:
+            return []
+
+        header, field = self._header, SECTION_HEADERS[self._header]
+        content = "\n".join(self._lines).strip()
+        self._header = None
+        self._lines = []
+
+        # A repeated header only replaces a shorter section, as in parse_sections.
+        if not _keep(self.sections, field, content):
+            return []
+
+        self.sections[field] = content
+        return [(header, field, content)]
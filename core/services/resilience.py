@@ -0,0 +1,86 @@
+import random
+import threading
+import time
+
+
+def backoff_delay(attempt, base, maximum):
+    """
+    Exponential backoff with full jitter for the given 0-based retry attempt.
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Fail fast once a dependency keeps failing.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() returns False until `reset_timeout` seconds have passed; then a
+    single trial call is let through (half-open). Its success closes the
+    breaker again, its failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+
+            # Open, or a half-open trial is already in flight.
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls evenly so no more than
+    `per_minute` start in any minute. A falsy rate disables limiting.
+    """
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
@@ -1,45 +1,52 @@
 from core.models.project import Project
-from core.services.ai_client import generate_ai_analysis
+from core.services.ai_client import AIError, generate_ai_analysis, agenerate_ai_analysis
+from core.services.prompts import build_risk_prompt
+
+
+# --- Rule weights (shared by the per-project and batch scorers) ---
+RISK_WEIGHTS = {
+    "low": 10,
+    "medium": 40,
+    "high": 70
+}
+
+PLATFORM_WEIGHTS = {
+    "api": 20,
+    "cloud": 20,
+    "iot": 25,
+    "mobile": 10,
+    "web": 10,
+    "other": 5
+}
+
+SCALE_WEIGHTS = {
+    "small": 5,
+    "medium": 10,
+    "large": 20
+}
+
+EXPECTED_BUDGETS = {
+    "small": 20000,
+    "medium": 50000,
+    "large": 120000
+}
 
 
 def calculate_rule_score(project: Project):
     score = 0
+    scale = project.scale.lower()
 
     # --- Risk level weight ---
-    risk_weights = {
-        "low": 10,
-        "medium": 40,
-        "high": 70
-    }
-    score += risk_weights.get(project.risk_level, 20)
+    score += RISK_WEIGHTS.get(project.risk_level, 20)
 
     # --- Platform exposure weighting ---
-    platform_weights = {
-        "api": 20,
-        "cloud": 20,
-        "iot": 25,
-        "mobile": 10,
-        "web": 10,
-        "other": 5
-    }
-    score += platform_weights.get(project.platform, 5)
+    score += PLATFORM_WEIGHTS.get(project.platform, 5)
 
     # --- Scale weighting ---
-    scale_weights = {
-        "small": 5,
-        "medium": 10,
-        "large": 20
-    }
-    score += scale_weights.get(project.scale.lower(), 10)
+    score += SCALE_WEIGHTS.get(scale, 10)
 
     # --- Budget adequacy scoring ---
-    expected_budget = 0
-    if project.scale.lower() == "small":
-        expected_budget = 20000
-    elif project.scale.lower() == "medium":
-        expected_budget = 50000
-    elif project.scale.lower() == "large":
-        expected_budget = 120000
+    expected_budget = EXPECTED_BUDGETS.get(scale, 0)
 
     if project.budget < expected_budget:
         score += 20  # underfunded increases risk
@@ -50,26 +57,94 @@ def calculate_rule_score(project: Project):
     return max(0, min(score, 100))
 
 
-def get_ai_risk_adjustment(project: Project):
-    prompt = f"""
-Rate the security risk severity of this system on a scale from 1 to 10.
-Return ONLY a number, no words.
+# Columns calculate_rule_scores() expects, in order
+RULE_SCORE_FIELDS = ("risk_level", "platform", "scale", "budget")
+
+
+def calculate_rule_scores(rows):
+    """
+    Batch calculate_rule_score() over (risk_level, platform, scale, budget)
+    rows, e.g. `projects.values_list(*RULE_SCORE_FIELDS)`.
+
+    The weights only depend on the three categorical columns, so each
+    distinct combination is resolved once into (base score, expected budget)
+    and every row is a dict lookup plus one comparison. Returns a list of
+    scores identical to calling calculate_rule_score() per project.
+    """
+    combos = {}
+    scores = []
+
+    for risk_level, platform, scale, budget in rows:
+        key = (risk_level, platform, scale)
+        combo = combos.get(key)
+
+        if combo is None:
+            scale_key = scale.lower()
+            combo = combos[key] = (
+                RISK_WEIGHTS.get(risk_level, 20)
+                + PLATFORM_WEIGHTS.get(platform, 5)
+                + SCALE_WEIGHTS.get(scale_key, 10),
+                EXPECTED_BUDGETS.get(scale_key, 0),
+            )
+
+        base, expected_budget = combo
+        score = base + 20 if budget < expected_budget else base - 10
+        scores.append(max(0, min(score, 100)))
+
+    return scores
+
+
+def calculate_rule_scores_columnar(risk_levels, platforms, scales, budgets):
+    """
+    calculate_rule_scores() for data already held as parallel columns.
+    """
+    return calculate_rule_scores(zip(risk_levels, platforms, scales, budgets))
+
+
+def score_projects(projects):
+    """
+    Rule-based score and risk category for every project in a queryset,
+    computed in one pass over `values_list`. Returns {project id: (score, category)}.
+    """
+    rows = list(projects.values_list("id", *RULE_SCORE_FIELDS))
+    scores = calculate_rule_scores(row[1:] for row in rows)
 
-System Details:
-Name: {project.name}
-Description: {project.description}
-Platform: {project.platform}
-Tech Stack: {project.tech_stack}
-Risk Level: {project.risk_level}
-Scale: {project.scale}
-Budget: {project.budget}
-"""
+    return {
+        row[0]: (score, _CATEGORY_BY_SCORE[score])
+        for row, score in zip(rows, scores)
+    }
+
+
+def get_ai_risk_adjustment(project: Project, use_cache=True):
+    try:
+        response = generate_ai_analysis(build_risk_prompt(project), use_cache=use_cache, purpose="risk")
+    except AIError as e:
+        # Degrade to the rule-based score rather than failing the analysis.
+        print(f"AI risk adjustment unavailable: {e}")
+        return 0
+
+    return parse_risk_adjustment(response)
+
+
+async def aget_ai_risk_adjustment(project: Project, use_cache=True):
+    try:
+        response = await agenerate_ai_analysis(build_risk_prompt(project), use_cache=use_cache, purpose="risk")
+    except AIError as e:
+        print(f"AI risk adjustment unavailable: {e}")
+        return 0
+
+    return parse_risk_adjustment(response)
 
-    response = generate_ai_analysis(prompt)
 
+def parse_risk_adjustment(value):
+    """
+    Normalise an AI severity rating (text or number) to the 0-10 range.
+    """
     # Ensure AI returns numeric value
     try:
-        ai_value = int("".join(filter(str.isdigit, response)))
+        if not isinstance(value, (int, float)):
+            value = "".join(filter(str.isdigit, str(value)))
+        ai_value = int(value)
         return max(0, min(ai_value, 10))
     except:
         return 0  # fallback if AI fails
@@ -83,9 +158,19 @@ def determine_risk_category(score: int):
     return "Low Risk"
 
 
-def calculate_final_security_score(project: Project):
+# Rule scores are clamped to 0-100, so categories are a table lookup.
+_CATEGORY_BY_SCORE = [determine_risk_category(score) for score in range(101)]
+
+
+def calculate_final_security_score(project: Project, ai_adjustment=None, use_cache=True):
+    """
+    Combine the rule-based score with the AI severity rating. Pass
+    `ai_adjustment` when the rating was already obtained (e.g. from the
+    combined analysis call) to skip the extra model round-trip.
+    """
     base_score = calculate_rule_score(project)
-    ai_adjustment = get_ai_risk_adjustment(project)
+    if ai_adjustment is None:
+        ai_adjustment = get_ai_risk_adjustment(project, use_cache=use_cache)
 
     final_score = base_score + (ai_adjustment * 2)
 
@@ -98,3 +183,10 @@ def calculate_final_security_score(project: Project):
     category = determine_risk_category(final_score)
 
     return final_score, category
+
+
+async def acalculate_final_security_score(project: Project, ai_adjustment=None, use_cache=True):
+    if ai_adjustment is None:
+        ai_adjustment = await aget_ai_risk_adjustment(project, use_cache=use_cache)
+
+    return calculate_final_security_score(project, ai_adjustment=ai_adjustment)
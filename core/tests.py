@@ -1,3 +1,1618 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import tempfile
+import time
+import zipfile
+from concurrent.futures import Future
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.middleware import MetricsMiddleware
+from core.models import AIUsage, AnalysisJob, BatchAnalysisJob, Project, ProjectAnalysis, ReportSection
+from core.services import ai_client, metrics, pdf_reports, pdf_worker
+from core.services.ai_client import parse_json_envelope
+from core.services.analysis_jobs import _claim_job, _execute_batch_job, _heartbeat, process_pending_jobs, requeue_stale_jobs
+from core.services.analysis_pipeline import (
+    build_analysis,
+    bulk_save_analyses,
+    generate_sections_and_score,
+    run_analysis,
+    save_analysis,
+)
+from core.services.batch_analysis import analyze_projects, get_rate_limiter
+from core.services.pdf_reports import pdf_cache_name, pdf_storage
+from core.services.prompts import (
+    TRUNCATION_MARKER,
+    build_analysis_prompt,
+    build_combined_prompt,
+    build_risk_prompt,
+    estimate_tokens,
+    fit_to_budget,
+    prompt_stats,
+)
+from core.services.report_sections import (
+    SECTION_FIELDS,
+    SectionStreamParser,
+    extract_section,
+    parse_sections,
+)
+from core.views.export_views import build_export_content
+from core.services.security_scoring import (
+    calculate_rule_score,
+    calculate_rule_scores,
+    calculate_rule_scores_columnar,
+    get_ai_risk_adjustment,
+    score_projects,
+)
+from google.api_core import exceptions as google_exceptions
+
+SAMPLE_REPORT = """
+EXECUTIVE SUMMARY
+Posture is reasonable.
+
+SYSTEM ARCHITECTURE
+Three tiers.
+
+THREAT MODEL
+STRIDE.
+
+SECURE SDLC
+Shift left.
+
+COST ESTIMATION
+Medium.
+
+SECURITY TESTING PLAN
+SAST and DAST.
+"""
+
+
+def fake_generate_ai_analysis(prompt, **kwargs):
+    if "Return ONLY a number" in prompt:
+        return "5"
+    return SAMPLE_REPORT
+
+
+def fake_generate_structured_analysis(prompt, **kwargs):
+    return None
+
+
+# Render PDFs inline unless a test exercises the process pool.
+@override_settings(PDF_WORKERS=0)
+class PlanixTestCase(TestCase):
+    def setUp(self):
+        # Keep rendered PDFs out of the real cache directory.
+        pdf_dir = self.enterContext(tempfile.TemporaryDirectory())
+        storages = {**settings.STORAGES, "pdf_reports": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": pdf_dir},
+        }}
+        self.enterContext(override_settings(STORAGES=storages))
+
+        self.user = User.objects.create_user("alice", password="secret")
+        self.client.force_login(self.user)
+        self.project = Project.objects.create(
+            user=self.user,
+            name="Shop",
+            description="Online shop",
+            platform="web",
+            tech_stack="Django",
+            scale="medium",
+            budget=60000,
+            risk_level="medium",
+        )
+
+
+@override_settings(ANALYSIS_JOBS_EAGER=True)
+@mock.patch("core.services.analysis_pipeline.generate_ai_analysis", fake_generate_ai_analysis)
+@mock.patch("core.services.analysis_pipeline.generate_structured_analysis", fake_generate_structured_analysis)
+@mock.patch("core.services.security_scoring.generate_ai_analysis", fake_generate_ai_analysis)
+class AnalysisJobTests(PlanixTestCase):
+    def test_generate_enqueues_job_and_redirects_to_status(self):
+        response = self.client.get(reverse("generate_analysis", args=[self.project.id]))
+
+        job = AnalysisJob.objects.get()
+        self.assertRedirects(
+            response,
+            reverse("analysis_job_status", args=[job.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(job.status, AnalysisJob.STATUS_DONE)
+
+    def test_finished_job_redirects_to_analysis(self):
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+        job = AnalysisJob.objects.get()
+        analysis = ProjectAnalysis.objects.get()
+
+        response = self.client.get(reverse("analysis_job_status", args=[job.id]))
+
+        self.assertRedirects(
+            response,
+            reverse("view_analysis", args=[analysis.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(analysis.threat_model, "STRIDE.")
+        self.assertEqual(analysis.security_score, 60)
+        self.assertEqual(analysis.risk_category, "Medium Risk")
+
+    def test_status_json(self):
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+        job = AnalysisJob.objects.get()
+
+        data = self.client.get(
+            reverse("analysis_job_status", args=[job.id]), {"format": "json"}
+        ).json()
+
+        self.assertEqual(data["status"], "done")
+        self.assertIsNotNone(data["redirect_url"])
+
+    @override_settings(ANALYSIS_JOBS_EAGER=False, ANALYSIS_JOB_STALE_SECONDS=60)
+    def test_status_fails_a_job_whose_worker_died(self):
+        job = AnalysisJob.objects.create(project=self.project, user=self.user)
+        url = reverse("analysis_job_status", args=[job.id])
+        long_ago = timezone.now() - timedelta(minutes=5)
+
+        # Waiting in the queue is not a sign of a dead worker.
+        AnalysisJob.objects.filter(id=job.id).update(updated_at=long_ago)
+        self.assertEqual(self.client.get(url, {"format": "json"}).json()["status"], AnalysisJob.STATUS_PENDING)
+
+        AnalysisJob.objects.filter(id=job.id).update(
+            status=AnalysisJob.STATUS_RUNNING, started_at=long_ago, updated_at=timezone.now()
+        )
+        # A long generation whose heartbeat is fresh is still running.
+        self.assertIsNone(self.client.get(url, {"format": "json"}).json()["redirect_url"])
+
+        AnalysisJob.objects.filter(id=job.id).update(updated_at=long_ago)
+        data = self.client.get(url, {"format": "json"}).json()
+
+        self.assertEqual(data["status"], AnalysisJob.STATUS_FAILED)
+        self.assertEqual(data["redirect_url"], url)
+        self.assertContains(self.client.get(url), "Try Again")
+
+    @override_settings(ANALYSIS_JOB_STALE_SECONDS=60)
+    def test_worker_loop_requeues_jobs_that_go_stale_while_it_runs(self):
+        job = AnalysisJob.objects.create(project=self.project, user=self.user)
+        iterations = []
+
+        def sleep(seconds):
+            if len(iterations) == 1:
+                # Its heartbeat stops after the worker loop started.
+                AnalysisJob.objects.filter(id=job.id).update(
+                    status=AnalysisJob.STATUS_RUNNING, updated_at=timezone.now() - timedelta(minutes=5)
+                )
+            elif len(iterations) == 2:
+                raise KeyboardInterrupt
+
+        with mock.patch("core.management.commands.run_analysis_jobs.process_pending_jobs",
+                        side_effect=lambda: iterations.append(1) or 0), \
+                mock.patch("core.management.commands.run_analysis_jobs.time.sleep", side_effect=sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("run_analysis_jobs", "--loop", stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_PENDING)
+
+    @override_settings(ANALYSIS_JOB_HEARTBEAT_SECONDS=0.01)
+    def test_heartbeat_runs_while_the_job_blocks(self):
+        model = mock.Mock()
+
+        with _heartbeat(model, 1):
+            time.sleep(0.1)
+        beats = model.objects.filter.return_value.update.call_count
+        time.sleep(0.05)
+
+        self.assertGreater(beats, 1)
+        self.assertEqual(model.objects.filter.return_value.update.call_count, beats)
+
+
+class CombinedAnalysisTests(PlanixTestCase):
+    def test_combined_envelope_skips_second_call(self):
+        envelope = {
+            "sections": {
+                "EXECUTIVE SUMMARY": "Summary",
+                "SYSTEM ARCHITECTURE": "Arch",
+                "THREAT MODEL": "Threats",
+                "SECURE SDLC": "SDLC",
+                "COST ESTIMATION": "Cost",
+                "SECURITY TESTING PLAN": "Tests",
+            },
+            "severity": 5,
+        }
+
+        with mock.patch(
+            "core.services.analysis_pipeline.generate_structured_analysis", return_value=envelope
+        ), mock.patch(
+            "core.services.analysis_pipeline.generate_ai_analysis"
+        ) as text_call, mock.patch(
+            "core.services.security_scoring.generate_ai_analysis"
+        ) as risk_call:
+            sections, score, category = generate_sections_and_score(self.project)
+
+        text_call.assert_not_called()
+        risk_call.assert_not_called()
+        self.assertEqual(sections["threat_model"], "Threats")
+        self.assertEqual((score, category), (60, "Medium Risk"))
+
+    def test_invalid_envelope_falls_back_to_two_calls(self):
+        with mock.patch(
+            "core.services.analysis_pipeline.generate_structured_analysis",
+            return_value={"sections": "oops"},
+        ), mock.patch(
+            "core.services.analysis_pipeline.generate_ai_analysis", fake_generate_ai_analysis
+        ), mock.patch(
+            "core.services.security_scoring.generate_ai_analysis", fake_generate_ai_analysis
+        ):
+            sections, score, category = generate_sections_and_score(self.project)
+
+        self.assertEqual(sections["executive_summary"], "Posture is reasonable.")
+        self.assertEqual(score, 60)
+
+    def test_parse_json_envelope_strips_code_fence(self):
+        self.assertEqual(parse_json_envelope('```json\n{"severity": 3}\n```'), {"severity": 3})
+        self.assertIsNone(parse_json_envelope("not json"))
+
+
+@mock.patch.object(ai_client, "GEMINI_API_KEY", "test-key")
+@mock.patch.object(ai_client, "_get_available_model", return_value="gemini-test")
+@mock.patch.object(ai_client.genai, "GenerativeModel")
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches[ai_client.AI_CACHE_ALIAS].clear()
+
+    def test_identical_prompt_is_served_from_cache(self, model_cls, _):
+        model_cls.return_value.generate_content.return_value = mock.Mock(text="report")
+        before = ai_client.get_cache_stats()
+
+        self.assertEqual(ai_client.generate_ai_analysis("prompt"), "report")
+        self.assertEqual(ai_client.generate_ai_analysis("prompt"), "report")
+
+        after = ai_client.get_cache_stats()
+        self.assertEqual(model_cls.return_value.generate_content.call_count, 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+    def test_bypass_flag_forces_fresh_call(self, model_cls, _):
+        model_cls.return_value.generate_content.return_value = mock.Mock(text="report")
+
+        ai_client.generate_ai_analysis("prompt")
+        ai_client.generate_ai_analysis("prompt", use_cache=False)
+
+        self.assertEqual(model_cls.return_value.generate_content.call_count, 2)
+
+
+class SectionStreamParserTests(TestCase):
+    def test_sections_are_emitted_as_soon_as_they_close(self):
+        parser = SectionStreamParser()
+        chunks = [SAMPLE_REPORT[i:i + 7] for i in range(0, len(SAMPLE_REPORT), 7)]
+
+        emitted = []
+        for index, chunk in enumerate(chunks):
+            for header, field, content in parser.feed(chunk):
+                emitted.append((index, field, content))
+        emitted.extend((len(chunks), field, content) for _, field, content in parser.close())
+
+        self.assertEqual(
+            [field for _, field, _ in emitted],
+            ["executive_summary", "architecture", "threat_model",
+             "sdls_recommendations", "cost_estimation", "testing_plan"],
+        )
+        # The summary is complete long before the stream ends.
+        self.assertLess(emitted[0][0], len(chunks) // 2)
+        self.assertEqual(parser.sections["threat_model"], "STRIDE.")
+
+    def test_markdown_headers_are_recognised(self):
+        parser = SectionStreamParser()
+        parser.feed("## EXECUTIVE SUMMARY\nok\n**THREAT MODEL**:\nbad\n")
+        parser.close()
+
+        self.assertEqual(parser.sections, {"executive_summary": "ok", "threat_model": "bad"})
+
+
+class ParseSectionsTests(TestCase):
+    def test_matches_legacy_extractor_on_plain_headers(self):
+        legacy = {field: extract_section(SAMPLE_REPORT, header) for header, field in SECTION_FIELDS}
+        self.assertEqual(parse_sections(SAMPLE_REPORT), legacy)
+
+    def test_markdown_variants(self):
+        text = (
+            "Here is the report.\n"
+            "## 1. EXECUTIVE SUMMARY\nposture\n"
+            "**System Architecture:**\ntiers\n"
+            "### 3) THREAT MODEL: STRIDE\nmore\n"
+            "__SECURE SDLC__\nreviews\n"
+        )
+
+        self.assertEqual(parse_sections(text), {
+            "executive_summary": "posture",
+            "architecture": "tiers",
+            "threat_model": "STRIDE\nmore",
+            "sdls_recommendations": "reviews",
+        })
+
+    def test_sections_end_at_the_nearest_header(self):
+        # extract_section cut at the first header in list order, not the nearest.
+        text = "THREAT MODEL\nSTRIDE\nSECURITY TESTING PLAN\nDAST\nSECURE SDLC\nreviews\n"
+
+        sections = parse_sections(text)
+
+        self.assertEqual(sections["threat_model"], "STRIDE")
+        self.assertEqual(sections["testing_plan"], "DAST")
+        self.assertNotEqual(extract_section(text, "THREAT MODEL"), "STRIDE")
+
+    def test_mentions_inside_text_are_not_headers(self):
+        text = "THREAT MODEL\nThe threat model covers SECURE SDLC gaps.\n"
+        self.assertEqual(parse_sections(text), {"threat_model": "The threat model covers SECURE SDLC gaps."})
+
+    def test_headers_with_trailing_words_or_parenthetical(self):
+        sample = ai_client.generate_ai_analysis.__doc__
+        expected = {field for header, field in SECTION_FIELDS if header in sample}
+
+        sections = parse_sections(sample)
+        parser = SectionStreamParser()
+        for line in sample.splitlines(keepends=True):
+            parser.feed(line)
+        parser.close()
+
+        for parsed in (sections, parser.sections):
+            self.assertEqual(set(parsed), expected)
+            self.assertTrue(all(parsed.values()), parsed)
+        self.assertTrue(sections["threat_model"].startswith("- Spoofing"))
+        self.assertTrue(sections["sdls_recommendations"].startswith("- Requirements phase"))
+        self.assertNotIn("Spoofing", sections["architecture"])
+
+    def test_sentence_starting_with_a_header_name_is_body_text(self):
+        text = SAMPLE_REPORT.replace(
+            "Posture is reasonable.\n", "Posture is reasonable.\nCost estimation: roughly $50k total.\n"
+        )
+        parser = SectionStreamParser()
+        parser.feed(text)
+        parser.close()
+
+        for sections in (parse_sections(text), parser.sections):
+            self.assertEqual(sections["executive_summary"], extract_section(text, "EXECUTIVE SUMMARY"))
+            self.assertIn("roughly $50k", sections["executive_summary"])
+            self.assertEqual(sections["cost_estimation"], "Medium.")
+
+        # Upper-case or decorated labels still introduce a section inline.
+        self.assertEqual(parse_sections("**Cost Estimation:** $50k"), {"cost_estimation": "$50k"})
+        self.assertEqual(parse_sections("COST ESTIMATION: $50k"), {"cost_estimation": "$50k"})
+
+    def test_repeated_header_keeps_the_fuller_section(self):
+        text = (
+            "EXECUTIVE SUMMARY\nSee COST ESTIMATION below.\nCOST ESTIMATION: TBD\n"
+            "COST ESTIMATION\n- Development: 3-5 engineer months\n- Hosting: $500/month\n"
+        )
+        parser = SectionStreamParser()
+        parser.feed(text)
+        parser.close()
+
+        for sections in (parse_sections(text), parser.sections):
+            self.assertEqual(sections["cost_estimation"], "- Development: 3-5 engineer months\n- Hosting: $500/month")
+
+    def test_lowercase_trailing_words_are_body_text(self):
+        text = "THREAT MODEL\nSTRIDE\nSecure SDLC reviews happen weekly\n"
+        self.assertEqual(parse_sections(text), {"threat_model": "STRIDE\nSecure SDLC reviews happen weekly"})
+
+    def test_stream_parser_agrees(self):
+        text = "## 1. EXECUTIVE SUMMARY\nposture\n**THREAT MODEL:** STRIDE\nmore\nTHREAT MODEL\ndup\n"
+        parser = SectionStreamParser()
+        parser.feed(text)
+        parser.close()
+
+        self.assertEqual(parser.sections, parse_sections(text))
+
+
+class StreamAnalysisViewTests(PlanixTestCase):
+    def test_stream_emits_sections_then_done(self):
+        chunks = [SAMPLE_REPORT[:40], SAMPLE_REPORT[40:]]
+
+        with mock.patch(
+            "core.views.analysis_views.stream_ai_analysis", return_value=iter(chunks)
+        ), mock.patch(
+            "core.services.security_scoring.generate_ai_analysis", fake_generate_ai_analysis
+        ):
+            response = self.client.get(reverse("stream_analysis", args=[self.project.id]))
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(body.count("event: section"), 6)
+        self.assertIn("event: done", body)
+        self.assertEqual(ProjectAnalysis.objects.get().testing_plan, "SAST and DAST.")
+
+    def test_unexpected_errors_end_with_a_failed_event(self):
+        with mock.patch(
+            "core.views.analysis_views.stream_ai_analysis", return_value=iter([SAMPLE_REPORT])
+        ), mock.patch(
+            "core.views.analysis_views.calculate_final_security_score", side_effect=RuntimeError("db down")
+        ):
+            response = self.client.get(reverse("stream_analysis", args=[self.project.id]))
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertTrue(body.rstrip().split("\n\n")[-1].startswith("event: failed"))
+        self.assertNotIn("event: done", body)
+        self.assertFalse(ProjectAnalysis.objects.exists())
+
+    def test_unparseable_output_is_logged_not_sent(self):
+        raw = "I cannot help with that. " * 200
+
+        with mock.patch(
+            "core.views.analysis_views.stream_ai_analysis", return_value=iter([raw])
+        ), mock.patch("builtins.print") as log:
+            response = self.client.get(reverse("stream_analysis", args=[self.project.id]))
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertIn("event: failed", body)
+        self.assertNotIn("I cannot help", body)
+        self.assertLess(len(body), 200)
+        self.assertIn("I cannot help", log.call_args.args[0])
+
+
+async def fake_agenerate_ai_analysis(prompt, **kwargs):
+    return fake_generate_ai_analysis(prompt)
+
+
+async def fake_agenerate_structured_analysis(prompt, **kwargs):
+    return None
+
+
+@mock.patch("core.services.analysis_pipeline.agenerate_ai_analysis", fake_agenerate_ai_analysis)
+@mock.patch("core.services.analysis_pipeline.agenerate_structured_analysis", fake_agenerate_structured_analysis)
+@mock.patch("core.services.security_scoring.agenerate_ai_analysis", fake_agenerate_ai_analysis)
+class AsyncAnalysisTests(PlanixTestCase):
+    def test_async_view_creates_analysis(self):
+        response = self.client.get(reverse("agenerate_analysis", args=[self.project.id]))
+
+        analysis = ProjectAnalysis.objects.get()
+        self.assertRedirects(
+            response, reverse("view_analysis", args=[analysis.id]), fetch_redirect_response=False
+        )
+        self.assertEqual(analysis.security_score, 60)
+
+    def test_async_view_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse("agenerate_analysis", args=[self.project.id]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/accounts/login/", response["Location"])
+
+
+@override_settings(GEMINI_MAX_CONCURRENCY=2)
+@mock.patch.object(ai_client, "GEMINI_API_KEY", "test-key")
+@mock.patch.object(ai_client, "_local_cached_model", return_value="gemini-test")
+class AsyncConcurrencyTests(TestCase):
+    def test_semaphore_caps_in_flight_requests(self, _):
+        in_flight = 0
+        peak = 0
+
+        async def slow_generate(prompt, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return mock.Mock(text="ok")
+
+        async def run():
+            return await asyncio.gather(*[
+                ai_client.agenerate_ai_analysis(f"prompt {i}", use_cache=False) for i in range(6)
+            ])
+
+        with mock.patch.object(ai_client.genai, "GenerativeModel") as model_cls:
+            model_cls.return_value.generate_content_async = slow_generate
+            results = asyncio.run(run())
+
+        self.assertEqual(results, ["ok"] * 6)
+        self.assertEqual(peak, 2)
+
+    @override_settings(GEMINI_MAX_RETRIES=0)
+    def test_queue_wait_does_not_count_against_the_deadline(self, _):
+        ai_client._circuit_breaker = None
+        self.addCleanup(setattr, ai_client, "_circuit_breaker", None)
+
+        async def slow_generate(prompt, **kwargs):
+            await asyncio.sleep(0.2)
+            return mock.Mock(text="ok")
+
+        async def run():
+            return await asyncio.gather(*[
+                ai_client.agenerate_ai_analysis(f"prompt {i}", use_cache=False, timeout=0.3)
+                for i in range(6)
+            ])
+
+        with mock.patch.object(ai_client.genai, "GenerativeModel") as model_cls:
+            model_cls.return_value.generate_content_async = slow_generate
+            results = asyncio.run(run())
+
+        self.assertEqual(results, ["ok"] * 6)
+        self.assertEqual(ai_client._get_circuit_breaker()._failures, 0)
+
+    @override_settings(GEMINI_QUEUE_TIMEOUT=0.05)
+    def test_queue_timeout_is_not_a_provider_failure(self, _):
+        ai_client._circuit_breaker = None
+        self.addCleanup(setattr, ai_client, "_circuit_breaker", None)
+
+        async def slow_generate(prompt, **kwargs):
+            await asyncio.sleep(0.2)
+            return mock.Mock(text="ok")
+
+        async def run():
+            return await asyncio.gather(*[
+                ai_client.agenerate_ai_analysis(f"prompt {i}", use_cache=False) for i in range(3)
+            ], return_exceptions=True)
+
+        with mock.patch.object(ai_client.genai, "GenerativeModel") as model_cls:
+            model_cls.return_value.generate_content_async = slow_generate
+            results = asyncio.run(run())
+
+        self.assertEqual(results[:2], ["ok", "ok"])
+        self.assertIsInstance(results[2], ai_client.AIUnavailableError)
+        self.assertEqual(ai_client._get_circuit_breaker()._failures, 0)
+
+
+@override_settings(BATCH_ANALYSIS_RATE_PER_MINUTE=0, ANALYSIS_JOBS_EAGER=True)
+@mock.patch("core.services.analysis_pipeline.generate_ai_analysis", fake_generate_ai_analysis)
+@mock.patch("core.services.analysis_pipeline.generate_structured_analysis", fake_generate_structured_analysis)
+@mock.patch("core.services.security_scoring.generate_ai_analysis", fake_generate_ai_analysis)
+class BatchAnalysisTests(PlanixTestCase):
+    def bulk_report(self, **data):
+        response = self.client.post(reverse("bulk_generate_analysis"), data)
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response["Location"]).json()
+        self.assertEqual(status["status"], AnalysisJob.STATUS_DONE)
+        return status["report"]
+
+    def test_bulk_endpoint_dedupes_identical_projects(self):
+        twin = Project.objects.get(id=self.project.id)
+        twin.pk = None
+        twin.save()
+
+        with mock.patch(
+            "core.services.batch_analysis.generate_sections_and_score",
+            wraps=generate_sections_and_score,
+        ) as generate:
+            report = self.bulk_report()
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(report["projects"], 2)
+        self.assertEqual(report["unique_prompts"], 1)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(report["failures"], [])
+        self.assertEqual(ProjectAnalysis.objects.filter(security_score=60).count(), 2)
+
+    def test_failures_are_reported_per_project(self):
+        with mock.patch(
+            "core.services.batch_analysis.generate_sections_and_score",
+            side_effect=RuntimeError("boom"),
+        ):
+            report = self.bulk_report()
+
+        self.assertEqual(report["created"], 0)
+        self.assertEqual(report["failures"], [{"project_id": self.project.id, "error": "boom"}])
+
+    @override_settings(ANALYSIS_JOBS_EAGER=False)
+    def test_bulk_endpoint_queues_a_job_instead_of_running_inline(self):
+        with mock.patch("core.services.analysis_jobs.analyze_projects") as analyze, \
+                mock.patch("core.services.analysis_jobs._get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("bulk_generate_analysis"), {"scope": "all"})
+
+        self.assertEqual(response.status_code, 202)
+        job = BatchAnalysisJob.objects.get()
+        self.assertEqual((job.status, job.scope), (AnalysisJob.STATUS_PENDING, BatchAnalysisJob.SCOPE_OWN))
+        self.assertEqual(response.json()["status_url"], reverse("batch_analysis_status", args=[job.id]))
+        analyze.assert_not_called()
+        executor.return_value.submit.assert_called_once()
+
+    @override_settings(ANALYSIS_JOBS_EAGER=False)
+    def test_one_active_batch_per_user(self):
+        with mock.patch("core.services.analysis_jobs._get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post(reverse("bulk_generate_analysis"))
+                second = self.client.post(reverse("bulk_generate_analysis"))
+
+        self.assertEqual((first.status_code, second.status_code), (202, 409))
+        self.assertEqual(second.json()["status_url"], first.json()["status_url"])
+        self.assertEqual(BatchAnalysisJob.objects.count(), 1)
+        executor.return_value.submit.assert_called_once()
+
+    def test_groups_are_saved_as_they_complete(self):
+        other = Project.objects.create(
+            user=self.user, name="Other", description="Internal API", platform="api",
+            tech_stack="Go", scale="small", budget=10000, risk_level="low",
+        )
+
+        with self.assertRaises(RuntimeError):
+            analyze_projects(Project.objects.all(), max_workers=1,
+                             heartbeat=mock.Mock(side_effect=RuntimeError("crash")))
+
+        self.assertEqual(ProjectAnalysis.objects.count(), 1)
+        self.assertIn(ProjectAnalysis.objects.get().project_id, (self.project.id, other.id))
+
+    def test_stale_heartbeat_requeues_and_resumes_the_batch(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        job = BatchAnalysisJob.objects.create(user=self.user, status=AnalysisJob.STATUS_RUNNING)
+        BatchAnalysisJob.objects.filter(id=job.id).update(started_at=long_ago)
+
+        # A long batch whose worker is still beating is left alone.
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+        BatchAnalysisJob.objects.filter(id=job.id).update(updated_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        # Analysed before the crash: not generated again.
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+        other = Project.objects.create(
+            user=self.user, name="Other", description="Internal API", platform="api",
+            tech_stack="Go", scale="small", budget=10000, risk_level="low",
+        )
+        self.assertEqual(process_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_DONE)
+        self.assertEqual(job.report["projects"], 1)
+        self.assertEqual(other.analyses.count(), 1)
+        self.assertEqual(self.project.analyses.count(), 1)
+
+    def test_requeued_batch_stops_its_old_worker(self):
+        job = BatchAnalysisJob.objects.create(user=self.user)
+        self.assertTrue(_claim_job(job.id, BatchAnalysisJob))
+
+        def requeued_meanwhile(projects, heartbeat):
+            BatchAnalysisJob.objects.filter(id=job.id).update(status=AnalysisJob.STATUS_PENDING, started_at=None)
+            heartbeat()
+
+        with mock.patch("core.services.analysis_jobs.analyze_projects", side_effect=requeued_meanwhile):
+            _execute_batch_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_PENDING)
+
+    def test_status_fails_a_batch_whose_worker_died(self):
+        job = BatchAnalysisJob.objects.create(user=self.user, status=AnalysisJob.STATUS_RUNNING)
+        BatchAnalysisJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        status = self.client.get(reverse("batch_analysis_status", args=[job.id])).json()
+
+        self.assertEqual(status["status"], AnalysisJob.STATUS_FAILED)
+
+    def test_batches_share_one_rate_limiter(self):
+        self.assertIs(get_rate_limiter(60), get_rate_limiter(60))
+
+    def test_status_is_private(self):
+        job = BatchAnalysisJob.objects.create(user=User.objects.create_user("bob"))
+        response = self.client.get(reverse("batch_analysis_status", args=[job.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(AI_BACKEND="local", AI_LOCAL_FAILURE_RATE=0, AI_LOCAL_LATENCY=0, GEMINI_MAX_RETRIES=1,
+                   GEMINI_RETRY_BACKOFF=0)
+class ProviderRateLimitTests(TestCase):
+    def setUp(self):
+        ai_client._backends.clear()
+        self.addCleanup(ai_client._backends.clear)
+        ai_client._circuit_breaker = None
+        self.addCleanup(setattr, ai_client, "_circuit_breaker", None)
+
+    def test_every_provider_call_and_retry_waits_for_a_slot(self):
+        limiter = mock.Mock()
+        backend = ai_client.get_backend()
+        failures = [google_exceptions.ServiceUnavailable("down"), None, None]
+
+        def generate(*args, **kwargs):
+            error = failures.pop(0)
+            if error:
+                raise error
+            return "ok"
+
+        with mock.patch.object(backend, "generate", side_effect=generate), ai_client.throttle_ai_calls(limiter):
+            ai_client.generate_ai_analysis("first", use_cache=False)   # one retry
+            ai_client.generate_ai_analysis("second", use_cache=False)
+            ai_client.generate_ai_analysis("second")                   # cache hit
+
+        self.assertEqual(limiter.wait.call_count, 3)
+
+        ai_client.generate_ai_analysis("third", use_cache=False)
+        self.assertEqual(limiter.wait.call_count, 3)
+
+
+@mock.patch.object(ai_client, "GEMINI_API_KEY", "test-key")
+class ModelDiscoveryTests(TestCase):
+    def setUp(self):
+        caches[ai_client.SHARED_CACHE_ALIAS].clear()
+        self._reset_local()
+        self.addCleanup(self._reset_local)
+
+    def _reset_local(self):
+        ai_client._cached_model = None
+        ai_client._cached_model_expires = 0.0
+
+    def test_selection_is_shared_between_processes(self):
+        listed = [mock.Mock(name="m", supported_generation_methods=["generateContent"])]
+        listed[0].name = "models/gemini-2.5-flash"
+
+        with mock.patch.object(ai_client.genai, "list_models", return_value=listed) as list_models:
+            self.assertEqual(ai_client._get_available_model(), "gemini-2.5-flash")
+            # A fresh worker only has the shared cache to go on.
+            self._reset_local()
+            self.assertEqual(ai_client._get_available_model(), "gemini-2.5-flash")
+
+        self.assertEqual(list_models.call_count, 1)
+
+    def test_failures_back_off_instead_of_relisting(self):
+        with mock.patch.object(
+            ai_client.genai, "list_models", side_effect=RuntimeError("down")
+        ) as list_models:
+            first = ai_client._get_available_model()
+            second = ai_client._get_available_model()
+
+        self.assertTrue(first.startswith("ERROR:"))
+        self.assertEqual(first, second)
+        self.assertEqual(list_models.call_count, 1)
+
+
+@override_settings(
+    GEMINI_MAX_RETRIES=2,
+    GEMINI_RETRY_BACKOFF=0,
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD=2,
+    GEMINI_CIRCUIT_RESET_SECONDS=60,
+)
+@mock.patch.object(ai_client, "GEMINI_API_KEY", "test-key")
+@mock.patch.object(ai_client, "_get_available_model", return_value="gemini-test")
+@mock.patch.object(ai_client.genai, "GenerativeModel")
+class ResilienceTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        ai_client._circuit_breaker = None
+        self.addCleanup(setattr, ai_client, "_circuit_breaker", None)
+
+    def test_transient_errors_are_retried(self, model_cls, _):
+        model_cls.return_value.generate_content.side_effect = [
+            google_exceptions.ServiceUnavailable("busy"),
+            mock.Mock(text="report"),
+        ]
+
+        self.assertEqual(ai_client.generate_ai_analysis("p", use_cache=False), "report")
+        self.assertEqual(model_cls.return_value.generate_content.call_count, 2)
+
+    def test_circuit_opens_and_fails_fast(self, model_cls, _):
+        model_cls.return_value.generate_content.side_effect = google_exceptions.DeadlineExceeded("slow")
+
+        for _attempt in range(2):
+            with self.assertRaises(ai_client.AITimeoutError):
+                ai_client.generate_ai_analysis("p", use_cache=False)
+        calls = model_cls.return_value.generate_content.call_count
+
+        with self.assertRaises(ai_client.AIUnavailableError):
+            ai_client.generate_ai_analysis("p", use_cache=False)
+        self.assertEqual(model_cls.return_value.generate_content.call_count, calls)
+
+    def test_risk_adjustment_degrades_to_zero(self, model_cls, _):
+        model_cls.return_value.generate_content.side_effect = google_exceptions.ServiceUnavailable("down")
+
+        self.assertEqual(get_ai_risk_adjustment(self.project, use_cache=False), 0)
+
+    @override_settings(ANALYSIS_JOBS_EAGER=True)
+    def test_failed_generation_does_not_store_error_text(self, model_cls, _):
+        model_cls.return_value.generate_content.side_effect = google_exceptions.ServiceUnavailable("down")
+
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+
+        job = AnalysisJob.objects.get()
+        self.assertEqual(job.status, AnalysisJob.STATUS_FAILED)
+        self.assertIn("unavailable", job.error)
+        self.assertFalse(ProjectAnalysis.objects.exists())
+
+
+@override_settings(AI_BACKEND="local", ANALYSIS_JOBS_EAGER=True, AI_LOCAL_FAILURE_RATE=0)
+class LocalBackendTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        ai_client._backends.clear()
+        caches[ai_client.AI_CACHE_ALIAS].clear()
+
+    def test_full_request_path_runs_offline(self):
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+
+        analysis = ProjectAnalysis.objects.get()
+        self.assertIn("Shop", analysis.executive_summary)
+        self.assertIn("Spoofing", analysis.threat_model)
+        self.assertTrue(analysis.testing_plan)
+        # medium risk -> severity 5
+        self.assertEqual(analysis.security_score, 60)
+
+    def test_stream_is_parsed_into_sections(self):
+        parser = SectionStreamParser()
+        for chunk in ai_client.stream_ai_analysis("Name: Shop\nRisk Level: high", use_cache=False):
+            parser.feed(chunk)
+        parser.close()
+
+        self.assertEqual(len(parser.sections), 6)
+
+
+class ReplayBackendTests(TestCase):
+    def setUp(self):
+        ai_client._backends.clear()
+        self.addCleanup(ai_client._backends.clear)
+        caches[ai_client.AI_CACHE_ALIAS].clear()
+        self.recordings = Path(tempfile.mkdtemp()) / "recordings.jsonl"
+
+    def test_recorded_responses_are_replayed(self):
+        with override_settings(AI_BACKEND="replay", AI_REPLAY_MODE="record", AI_REPLAY_FILE=str(self.recordings)):
+            with mock.patch(
+                "core.services.ai_client.GeminiBackend.select_model", return_value="gemini-test"
+            ), mock.patch(
+                "core.services.ai_client.GeminiBackend.generate", return_value="recorded"
+            ):
+                self.assertEqual(ai_client.generate_ai_analysis("p", use_cache=False), "recorded")
+
+        ai_client._backends.clear()
+        with override_settings(AI_BACKEND="replay", AI_REPLAY_MODE="replay", AI_REPLAY_FILE=str(self.recordings)):
+            self.assertEqual(ai_client.generate_ai_analysis("p", use_cache=False), "recorded")
+            with self.assertRaises(ai_client.AIResponseError):
+                ai_client.generate_ai_analysis("unknown", use_cache=False)
+
+
+class DashboardTests(PlanixTestCase):
+    def _add_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                user=self.user, name=f"P{i}", description="d", platform="api",
+                tech_stack="Go", scale="small", budget=1, risk_level="high",
+            )
+            ProjectAnalysis.objects.create(project=project, user=self.user, security_score=10, risk_category="Low Risk")
+            ProjectAnalysis.objects.create(project=project, user=self.user, security_score=80, risk_category="High Risk")
+
+    def test_query_count_does_not_grow_with_projects(self):
+        self._add_projects(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse("dashboard"))
+
+        self._add_projects(10)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, "High Risk — 80")
+        self.assertNotContains(response, "Low Risk — 10")
+
+    @override_settings(DASHBOARD_PAGE_SIZE=5)
+    def test_paginated(self):
+        self._add_projects(7)
+
+        response = self.client.get(reverse("dashboard"), {"page": 2})
+
+        self.assertEqual(len(response.context["projects"]), 3)
+
+
+class HistoryTests(PlanixTestCase):
+    def _add_analyses(self, scores):
+        for score in scores:
+            ProjectAnalysis.objects.create(project=self.project, user=self.user, security_score=score)
+
+    def test_trend_is_aggregated_in_sql(self):
+        # Oldest first; 0 means "unscored" and is ignored.
+        self._add_analyses([30, 0, 90, 60])
+
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(reverse("analysis_history", args=[self.project.id]))
+
+        self.assertEqual(
+            response.context["trend"],
+            {"highest": 90, "lowest": 30, "average": 60, "improving": True},
+        )
+
+        self._add_analyses([50] * 20)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse("analysis_history", args=[self.project.id]))
+        self.assertEqual(len(few), len(many))
+
+    def test_listing_does_not_load_report_text(self):
+        self._add_analyses([40])
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse("analysis_history", args=[self.project.id]))
+
+        self.assertFalse(any("core_analysisreport" in q["sql"] for q in captured.captured_queries))
+
+    def test_days_window(self):
+        self._add_analyses([40, 70])
+        ProjectAnalysis.objects.filter(security_score=40).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+
+        response = self.client.get(reverse("analysis_history", args=[self.project.id]), {"days": 7})
+
+        self.assertEqual(len(response.context["analyses"]), 1)
+        self.assertEqual(response.context["trend"]["lowest"], 70)
+
+
+class QueryPlanTests(PlanixTestCase):
+    """
+    EXPLAIN QUERY PLAN (SQLite) must pick the composite indexes for the hot
+    access paths rather than scanning or sorting in a temp b-tree.
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def analysis_query_plans(self, url):
+        """
+        EXPLAIN QUERY PLAN of every core_projectanalysis query `url` runs.
+        """
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in captured:
+                sql = query["sql"]
+                if sql.startswith("SELECT") and '"core_projectanalysis"' in sql:
+                    cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                    plans[sql] = "\n".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertTrue(plans)
+        return plans
+
+    def assertViewUsesIndex(self, url, index_name):
+        for sql, plan in self.analysis_query_plans(url).items():
+            if "ORDER BY" in sql:
+                self.assertIn(index_name, plan, sql)
+            self.assertNotIn("USE TEMP B-TREE", plan, sql)
+            self.assertNotRegex(plan, r"SCAN (core_projectanalysis|U0)", sql)
+
+    def test_dashboard_projects(self):
+        self.assertUsesIndex(
+            Project.objects.filter(user=self.user).order_by("-created_at"),
+            "core_project_user_created_idx",
+        )
+
+    def test_dashboard_latest_analysis(self):
+        save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        self.assertViewUsesIndex(reverse("dashboard"), "core_analysis_proj_created_idx")
+
+    def test_history_listing_and_trend(self):
+        save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        self.assertViewUsesIndex(
+            reverse("analysis_history", args=[self.project.id]), "core_analysis_proj_created_idx"
+        )
+
+    def test_zip_export(self):
+        save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        self.assertViewUsesIndex(
+            reverse("export_analysis_history_zip", args=[self.project.id]), "core_analysis_proj_created_idx"
+        )
+
+
+class CompressedReportTests(PlanixTestCase):
+    def test_sections_are_compressed_at_rest(self):
+        text = "Spoofing: enforce MFA and token-based identity\n" * 50
+        analysis = save_analysis(self.project, self.user, {"threat_model": text}, 40, "Medium Risk")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT s.body FROM core_reportsection s JOIN core_analysisreport r"
+                " ON s.digest IN (r.threat_model_section_id, r.testing_plan_section_id)"
+                " WHERE r.analysis_id = %s ORDER BY length(s.body) DESC",
+                [analysis.id],
+            )
+            (stored,), (empty,) = cursor.fetchall()
+
+        self.assertLess(len(stored), len(text) // 10)
+        self.assertEqual(bytes(empty), b"")
+
+        reloaded = ProjectAnalysis.objects.select_related("report").get(id=analysis.id)
+        self.assertEqual(reloaded.threat_model, text)
+        self.assertEqual(reloaded.testing_plan, "")
+
+
+class DeduplicatedReportTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+
+    def test_identical_sections_are_stored_once(self):
+        sections = {"threat_model": "Spoofing: enforce MFA", "testing_plan": "SAST and DAST"}
+        save_analysis(self.project, self.user, sections, 40, "Medium Risk")
+        bulk_save_analyses(
+            [build_analysis(self.project, self.user, sections, 40, "Medium Risk") for _ in range(5)]
+        )
+
+        # Two distinct texts plus the shared empty section.
+        self.assertEqual(ReportSection.objects.count(), 3)
+        self.assertEqual(ProjectAnalysis.objects.count(), 6)
+
+        for analysis in ProjectAnalysis.objects.select_related("report"):
+            self.assertEqual(analysis.threat_model, "Spoofing: enforce MFA")
+            self.assertEqual(analysis.executive_summary, "")
+
+    def test_zip_export_loads_sections_in_one_query(self):
+        bulk_save_analyses(
+            [
+                build_analysis(self.project, self.user, {"architecture": f"Tier {i % 3}"}, 40, "Medium Risk")
+                for i in range(12)
+            ]
+        )
+        self.client.force_login(self.user)
+        url = reverse("export_analysis_history_zip", args=[self.project.id])
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+            b"".join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        section_queries = [q for q in captured if "core_reportsection" in q["sql"]]
+        self.assertEqual(len(section_queries), 1)
+
+        # A second export reuses the cached sections.
+        with CaptureQueriesContext(connection) as captured:
+            b"".join(self.client.get(url).streaming_content)
+        self.assertFalse([q for q in captured if "core_reportsection" in q["sql"]])
+
+
+    def test_prune_keeps_referenced_and_recently_stored_sections(self):
+        analysis = save_analysis(self.project, self.user, {"threat_model": "Old"}, 40, "Medium Risk")
+        analysis.delete()
+        save_analysis(self.project, self.user, {"architecture": "Kept"}, 40, "Medium Risk")
+        ReportSection.objects.update(last_stored_at=timezone.now() - timedelta(days=1))
+        # About to be referenced by an analysis that is being saved.
+        ReportSection.store(["In flight"])
+
+        call_command("prune_report_sections", stdout=io.StringIO())
+
+        remaining = {section.body for section in ReportSection.objects.all()}
+        self.assertEqual(remaining, {"", "Kept", "In flight"})
+
+    def test_storing_an_existing_section_marks_it_recent(self):
+        digest = ReportSection.store(["Reused"])["Reused"]
+        ReportSection.objects.update(last_stored_at=timezone.now() - timedelta(days=1))
+
+        ReportSection.store(["Reused"])
+
+        stored = ReportSection.objects.get(digest=digest)
+        self.assertGreater(stored.last_stored_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(stored.body, "Reused")
+
+
+class HistoryZipExportTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse("export_analysis_history_zip", args=[self.project.id])
+
+    def _archive(self, response):
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streams_every_analysis_with_unique_names(self):
+        # Saved within the same minute: names used to collide.
+        analyses = [
+            save_analysis(self.project, self.user, {"architecture": f"Tier {i}"}, 40, "Medium Risk")
+            for i in range(5)
+        ]
+
+        archive = self._archive(self.client.get(self.url))
+
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(len(set(names)), 5)
+        self.assertTrue(names[0].endswith(f"_{analyses[0].id}.md"))
+        self.assertIn("Tier 4", archive.read(names[4]).decode())
+
+    def test_date_range(self):
+        old = save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        ProjectAnalysis.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=30))
+        recent = save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+
+        since = (timezone.now() - timedelta(days=7)).date().isoformat()
+        archive = self._archive(self.client.get(self.url, {"from": since}))
+        self.assertEqual([n.rsplit("_", 1)[1] for n in archive.namelist()], [f"{recent.id}.md"])
+
+        archive = self._archive(self.client.get(self.url, {"days": "7"}))
+        self.assertEqual(len(archive.namelist()), 1)
+
+        response = self.client.get(self.url, {"to": "2000-01-01"})
+        self.assertEqual(response.content, b"No analyses available to export.")
+
+        # Malformed dates are ignored rather than rejected.
+        archive = self._archive(self.client.get(self.url, {"from": "2024-02-31"}))
+        self.assertEqual(len(archive.namelist()), 2)
+
+
+@override_settings(ANALYSIS_JOBS_EAGER=True, PDF_TEMPLATE_VERSION="v1", PDF_WORKERS=0)
+@mock.patch("core.services.pdf_worker.render_documents")
+class PdfCacheTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        self.analysis = save_analysis(self.project, self.user, {"architecture": "Tiers"}, 40, "Medium Risk")
+        self.url = reverse("download_analysis_pdf", args=[self.analysis.id])
+
+    def test_renders_once_and_serves_from_cache(self, render):
+        render.return_value = b"%PDF-1.4 cached"
+
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(b"".join(first.streaming_content), b"%PDF-1.4 cached")
+        self.assertEqual(b"".join(second.streaming_content), b"%PDF-1.4 cached")
+        self.assertEqual(render.call_count, 1)
+        self.assertIn("attachment", first["Content-Disposition"])
+        self.assertEqual(first["ETag"], f'"{self.analysis.id}-v1"')
+        self.assertIn("Last-Modified", first)
+
+    def test_conditional_get(self, render):
+        render.return_value = b"%PDF-1.4"
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with override_settings(PDF_TEMPLATE_VERSION="v2"):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render.call_count, 2)
+
+    def test_other_users_get_404(self, render):
+        User.objects.create_user("bob", password="secret")
+        self.client.login(username="bob", password="secret")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @mock.patch("core.services.analysis_pipeline.generate_ai_analysis", fake_generate_ai_analysis)
+    @mock.patch("core.services.analysis_pipeline.generate_structured_analysis", fake_generate_structured_analysis)
+    @mock.patch("core.services.security_scoring.generate_ai_analysis", fake_generate_ai_analysis)
+    def test_generation_prerenders_pdf(self, render):
+        render.return_value = b"%PDF-1.4"
+
+        self.client.get(reverse("generate_analysis", args=[self.project.id]))
+        job = AnalysisJob.objects.get()
+
+        self.assertTrue(pdf_storage().exists(pdf_cache_name(job.analysis_id)))
+        self.client.get(reverse("download_analysis_pdf", args=[job.analysis_id]))
+        self.assertEqual(render.call_count, 1)
+
+    def test_history_pdf_combines_all_analyses(self, render):
+        render.return_value = b"%PDF-1.4 history"
+        save_analysis(self.project, self.user, {"architecture": "Second"}, 50, "Medium Risk")
+        url = reverse("download_history_pdf", args=[self.project.id])
+
+        response = self.client.get(url)
+
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 history")
+        (documents,), _ = render.call_args
+        self.assertEqual(len(documents), 2)
+        self.assertIn("Tiers", documents[0])
+        self.assertIn("Second", documents[1])
+
+        # Cached until the history changes.
+        self.client.get(url)
+        self.assertEqual(render.call_count, 1)
+        save_analysis(self.project, self.user, {}, 50, "Medium Risk")
+        self.client.get(url)
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(
+            [name for name in pdf_storage().listdir("")[1] if name.startswith("history_")],
+            [pdf_reports.history_pdf_cache_name(
+                self.project.id, ProjectAnalysis.objects.order_by("created_at").values_list("id", flat=True)
+            )],
+        )
+
+    def test_new_template_version_renders_again_and_prune_drops_the_old_one(self, render):
+        render.return_value = b"%PDF-1.4"
+        self.client.get(self.url)
+        with override_settings(PDF_TEMPLATE_VERSION="v2"):
+            self.client.get(self.url)
+            self.assertEqual(render.call_count, 2)
+            self.assertEqual(pdf_reports.prune_pdf_cache(), 1)
+
+        self.assertEqual(pdf_storage().listdir("")[1], [f"analysis_{self.analysis.id}_v2.pdf"])
+
+    def test_rendering_does_not_list_the_cache(self, render):
+        render.return_value = b"%PDF-1.4"
+        with mock.patch.object(type(pdf_storage()), "listdir", side_effect=AssertionError("listdir")):
+            self.client.get(self.url)
+            save_analysis(self.project, self.user, {}, 50, "Medium Risk")
+            self.client.get(reverse("download_history_pdf", args=[self.project.id]))
+
+        self.assertEqual(render.call_count, 2)
+
+    def test_prune_removes_files_that_can_no_longer_be_served(self, render):
+        render.return_value = b"%PDF-1.4"
+        storage = pdf_storage()
+        self.client.get(self.url)
+        self.client.get(reverse("download_history_pdf", args=[self.project.id]))
+        current = set(storage.listdir("")[1])
+        for name in ("analysis_999_v1.pdf", f"analysis_{self.analysis.id}_v0.pdf", f"history_{self.project.id}_abc_v1.pdf"):
+            storage.save(name, io.BytesIO(b"%PDF"))
+
+        self.assertEqual(pdf_reports.prune_pdf_cache(), 3)
+        self.assertEqual(set(storage.listdir("")[1]), current)
+
+
+@override_settings(PDF_TEMPLATE_VERSION="v1", PDF_WORKERS=1, PDF_QUEUE_SIZE=1, PDF_WAIT_SECONDS=0)
+class PdfWorkerPoolTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        self.analysis = save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        self.url = reverse("download_analysis_pdf", args=[self.analysis.id])
+
+        # Stand-in for the process pool whose renders never finish.
+        self.pool = mock.Mock()
+        self.pool.submit.side_effect = lambda *args: Future()
+        self.enterContext(mock.patch("core.services.pdf_reports._get_pool", return_value=self.pool))
+        self.addCleanup(pdf_reports._pending.clear)
+
+    def test_slow_render_returns_202_and_poll_url(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["poll_url"], self.url)
+        self.assertEqual(response["Location"], self.url)
+
+        # Polling shares the render already in flight.
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertEqual(self.pool.submit.call_count, 1)
+
+    def test_full_queue_returns_503(self):
+        self.client.get(self.url)
+        other = save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+
+        response = self.client.get(reverse("download_analysis_pdf", args=[other.id]))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_finished_render_is_stored(self):
+        self.client.get(self.url)
+        name = pdf_cache_name(self.analysis.id)
+        future = pdf_reports._pending[name]
+
+        render = Future()
+        render.set_result(b"%PDF-1.4 done")
+        pdf_reports._finish(name, render, future, "analysis", time.perf_counter())
+
+        self.assertEqual(future.result(), name)
+        self.assertNotIn(name, pdf_reports._pending)
+        response = self.client.get(self.url)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 done")
+
+    def test_worker_render_times_out(self):
+        def slow(documents):
+            time.sleep(5)
+
+        with mock.patch("core.services.pdf_worker.render_documents", slow):
+            with self.assertRaises(TimeoutError):
+                pdf_worker.render(["<p>x</p>"], timeout=0.1)
+
+
+class ExportCacheTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        self.analysis = save_analysis(
+            self.project, self.user, {"architecture": "Tiered web app\n" * 100}, 40, "Medium Risk"
+        )
+        self.url = reverse("export_analysis_md", args=[self.analysis.id])
+
+    def test_export_is_rendered_once_per_format(self):
+        with mock.patch(
+            "core.views.export_views.build_export_content", wraps=build_export_content
+        ) as build:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            txt = self.client.get(reverse("export_analysis_txt", args=[self.analysis.id]))
+
+        self.assertEqual(first.content, second.content)
+        self.assertIn(b"Tiered web app", first.content)
+        self.assertEqual(first["Content-Type"], "text/markdown")
+        self.assertEqual(txt["Content-Type"], "text/plain")
+        self.assertEqual(build.call_count, 2)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip_when_accepted(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        # The compressed variant gets a weak ETag that still validates.
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"], HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_users_get_404(self):
+        User.objects.create_user("bob", password="secret")
+        self.client.login(username="bob", password="secret")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class BatchScoringTests(PlanixTestCase):
+    def test_matches_per_project_score(self):
+        rows = [
+            (risk_level, platform, scale, budget)
+            for risk_level in ["low", "medium", "high", "unknown"]
+            for platform in ["api", "cloud", "iot", "mobile", "web", "other", "desktop"]
+            for scale in ["small", "Medium", "LARGE", "huge", ""]
+            for budget in [0, 19999, 20000, 49999, 50000, 119999, 120000, 10**9]
+        ]
+
+        expected = [
+            calculate_rule_score(Project(risk_level=r, platform=p, scale=s, budget=b))
+            for r, p, s, b in rows
+        ]
+
+        self.assertEqual(calculate_rule_scores(rows), expected)
+        self.assertEqual(calculate_rule_scores_columnar(*zip(*rows)), expected)
+
+    def test_score_projects(self):
+        other = Project.objects.create(
+            user=self.user, name="Api", description="", platform="api", tech_stack="Go",
+            scale="large", budget=1000, risk_level="high",
+        )
+
+        with self.assertNumQueries(1):
+            scores = score_projects(Project.objects.all())
+
+        self.assertEqual(scores, {
+            self.project.id: (50, "Medium Risk"),
+            other.id: (100, "High Risk"),
+        })
+
+
+class PromptBudgetTests(PlanixTestCase):
+    def test_small_projects_are_sent_verbatim(self):
+        prompt = build_analysis_prompt(self.project)
+
+        self.assertIn("Description: Online shop\n", prompt)
+        self.assertEqual(prompt_stats(self.project)["prompt_truncated"], False)
+        self.assertIn("Return ONLY a number", build_risk_prompt(self.project))
+
+    @override_settings(PROMPT_DESCRIPTION_MAX_TOKENS=100)
+    def test_oversized_description_is_truncated(self):
+        self.project.description = "word " * 20000  # ~100 KB pasted document
+
+        prompt = build_combined_prompt(self.project)
+
+        self.assertLess(estimate_tokens(prompt), 600)
+        self.assertIn(TRUNCATION_MARKER, prompt)
+        self.assertIn('"severity"', prompt)
+        self.assertLessEqual(estimate_tokens(build_risk_prompt(self.project)), 200)
+
+    def test_whitespace_is_condensed_before_cutting(self):
+        text = "Django\n\n        React\n\n        Postgres"
+        self.assertEqual(fit_to_budget(text, 6), ("Django React Postgres", True))
+
+        fitted, truncated = fit_to_budget("alpha beta gamma delta epsilon", 5)
+        self.assertTrue(truncated)
+        self.assertEqual(fitted, "alpha" + TRUNCATION_MARKER)
+
+    @override_settings(PROMPT_DESCRIPTION_MAX_TOKENS=100)
+    def test_prompt_size_falls_back_to_the_combined_prompt(self):
+        self.project.description = "x " * 5000
+        self.project.save()
+
+        analysis = save_analysis(self.project, self.user, {}, 40, "Medium Risk")
+        analysis.refresh_from_db()
+
+        self.assertTrue(analysis.prompt_truncated)
+        self.assertEqual(analysis.prompt_tokens, estimate_tokens(build_combined_prompt(self.project)))
+
+
+class MetricsTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        for metric in (metrics.REQUEST_LATENCY, metrics.REQUEST_QUERIES, metrics.AI_CALL_LATENCY, metrics.EXPORT_SIZE):
+            metric.clear()
+
+    def test_requests_are_labelled_by_url_name(self):
+        self.client.get(reverse("dashboard"))
+        self.client.get(reverse("dashboard"))
+        self.client.get("/no-such-page/")
+
+        self.assertEqual(metrics.REQUEST_LATENCY.count(view="dashboard", method="GET", status=200), 2)
+        self.assertEqual(metrics.REQUEST_LATENCY.count(view="unmatched", method="GET", status=404), 1)
+        self.assertEqual(metrics.REQUEST_QUERIES.count(view="dashboard"), 2)
+
+    def test_metrics_endpoint_renders_prometheus_text(self):
+        analysis = save_analysis(self.project, self.user, {"architecture": "Tiers"}, 40, "Medium Risk")
+        self.client.get(reverse("export_analysis_md", args=[analysis.id]))
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE planix_request_duration_seconds histogram", body)
+        self.assertIn(
+            'planix_request_duration_seconds_bucket{view="export_analysis_md",method="GET",status="200",le="+Inf"} 1',
+            body,
+        )
+        self.assertIn('planix_export_size_bytes_count{format="md"} 1', body)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_require_staff_or_token(self):
+        url = reverse("metrics")
+        # A local client (e.g. a reverse proxy on the same host) is not enough.
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"]):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR="10.0.0.5").status_code, 200)
+
+        self.client.force_login(self.user)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(AI_BACKEND="local", AI_LOCAL_FAILURE_RATE=0, AI_LOCAL_LATENCY=0)
+    def test_ai_calls_are_timed_by_outcome(self):
+        ai_client._backends.clear()
+        self.addCleanup(ai_client._backends.clear)
+
+        ai_client.generate_ai_analysis("Name: Shop", use_cache=False)
+        with mock.patch.object(ai_client.get_backend(), "generate", side_effect=TimeoutError("slow")), \
+                override_settings(GEMINI_MAX_RETRIES=0):
+            with self.assertRaises(ai_client.AITimeoutError):
+                ai_client.generate_ai_analysis("Name: Shop", use_cache=False)
+
+        self.assertEqual(metrics.AI_CALL_LATENCY.count(backend="local", outcome="ok"), 1)
+        self.assertEqual(metrics.AI_CALL_LATENCY.count(backend="local", outcome="timeout"), 1)
+
+    @override_settings(DEBUG=True)  # handler adaptation is only logged in debug mode
+    def test_middleware_keeps_the_async_chain_async(self):
+        with self.assertLogs("django.request", "DEBUG") as logs:
+            response = async_to_sync(self.async_client.get)("/no-such-page/")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse([line for line in logs.output if "MetricsMiddleware" in line])
+        self.assertEqual(metrics.REQUEST_LATENCY.count(view="unmatched", method="GET", status=404), 1)
+
+    def test_queries_of_async_views_are_counted(self):
+        async def view(request):
+            await User.objects.acount()
+            await Project.objects.acount()
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get("/")
+        request.resolver_match = None
+
+        async_to_sync(middleware)(request)
+
+        self.assertIn('planix_request_db_queries_sum{view="unmatched"} 2', metrics.REQUEST_QUERIES.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("planix_test_seconds", "Test.", ["view"], buckets=(1, 5))
+        self.addCleanup(metrics._registry.remove, histogram)
+        for value in (0.5, 3, 10):
+            histogram.observe(value, view="x")
+
+        self.assertEqual(histogram.render()[2:], [
+            'planix_test_seconds_bucket{view="x",le="1"} 1',
+            'planix_test_seconds_bucket{view="x",le="5"} 2',
+            'planix_test_seconds_bucket{view="x",le="+Inf"} 3',
+            'planix_test_seconds_sum{view="x"} 13.5',
+            'planix_test_seconds_count{view="x"} 3',
+        ])
+
+
+@override_settings(AI_BACKEND="local", AI_LOCAL_FAILURE_RATE=0, AI_LOCAL_LATENCY=0, ANALYSIS_JOBS_EAGER=True)
+@mock.patch("core.services.analysis_pipeline.generate_structured_analysis", fake_generate_structured_analysis)
+class AIUsageTests(PlanixTestCase):
+    def setUp(self):
+        super().setUp()
+        caches[ai_client.AI_CACHE_ALIAS].clear()
+        ai_client._backends.clear()
+        self.addCleanup(ai_client._backends.clear)
+
+    def test_every_call_is_recorded_against_the_analysis(self):
+        analysis = run_analysis(self.project, self.user)
+
+        usage = {row.purpose: row for row in analysis.ai_usage.all()}
+        self.assertEqual(set(usage), {"analysis", "risk"})
+        report = usage["analysis"]
+        self.assertEqual((report.backend, report.model_name), ("local", "local-template"))
+        self.assertEqual(report.user, self.user)
+        self.assertTrue(report.estimated)
+        self.assertFalse(report.cached)
+        self.assertEqual(report.prompt_tokens, estimate_tokens(build_analysis_prompt(self.project)))
+        self.assertGreater(report.response_tokens, 0)
+        self.assertEqual(usage["risk"].prompt_tokens, estimate_tokens(build_risk_prompt(self.project)))
+
+    def test_prompt_size_is_that_of_the_prompts_sent(self):
+        analysis = run_analysis(self.project, self.user)
+        cached = run_analysis(self.project, self.user)
+
+        sent = estimate_tokens(build_analysis_prompt(self.project)) + estimate_tokens(build_risk_prompt(self.project))
+        self.assertEqual(analysis.prompt_tokens, sent)
+        self.assertEqual(cached.prompt_tokens, sent)
+        self.assertNotEqual(sent, estimate_tokens(build_combined_prompt(self.project)))
+
+    def test_cache_hits_cost_no_tokens(self):
+        run_analysis(self.project, self.user)
+        analysis = run_analysis(self.project, self.user)
+
+        rows = list(analysis.ai_usage.all())
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row.cached and row.total_tokens == 0 for row in rows))
+
+    @mock.patch.object(ai_client, "GEMINI_API_KEY", "test-key")
+    @mock.patch.object(ai_client, "_get_available_model", return_value="gemini-test")
+    @mock.patch.object(ai_client.genai, "GenerativeModel")
+    @override_settings(AI_BACKEND="gemini")
+    def test_provider_usage_metadata_is_preferred(self, model_cls, _):
+        model_cls.return_value.generate_content.return_value = mock.Mock(
+            text="report",
+            usage_metadata=mock.Mock(prompt_token_count=120, candidates_token_count=30),
+        )
+
+        with ai_client.track_ai_calls() as calls:
+            ai_client.generate_ai_analysis("prompt", purpose="risk")
+
+        [call] = calls
+        self.assertEqual((call.purpose, call.model_name), ("risk", "gemini-test"))
+        self.assertEqual((call.prompt_tokens, call.response_tokens), (120, 30))
+        self.assertFalse(call.estimated)
+
+    def test_calls_outside_tracking_are_not_collected(self):
+        with ai_client.track_ai_calls() as calls:
+            pass
+        ai_client.generate_ai_analysis("Name: Shop")
+
+        self.assertEqual(calls, [])
+
+    def test_batch_bills_shared_calls_once(self):
+        twin = Project.objects.get(id=self.project.id)
+        twin.pk = None
+        twin.save()
+
+        self.client.post(reverse("bulk_generate_analysis"))
+
+        self.assertEqual(ProjectAnalysis.objects.count(), 2)
+        self.assertEqual(AIUsage.objects.count(), 2)
+        self.assertEqual(AIUsage.objects.values("analysis").distinct().count(), 1)
+
+    def test_report_is_staff_only_and_aggregates_per_user_per_day(self):
+        run_analysis(self.project, self.user)
+        run_analysis(self.project, self.user)
+
+        self.assertEqual(self.client.get(reverse("ai_usage_report")).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("ai_usage_report"), {"days": "7"})
+
+        self.assertEqual(response.status_code, 200)
+        [row] = response.context["rows"]
+        self.assertEqual(row["user__username"], "alice")
+        self.assertEqual((row["analyses"], row["calls"], row["cached_calls"]), (2, 4, 2))
+        self.assertEqual(response.context["totals"]["prompt_tokens"], row["prompt_total"])
@@ -1,111 +1,224 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from core.models.project import Project
 from core.models.project_analysis import ProjectAnalysis
-from core.services.ai_client import generate_ai_analysis
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from core.models.analysis_job import AnalysisJob
+from core.models.batch_analysis_job import BatchAnalysisJob
+from core.services.analysis_jobs import enqueue_analysis, enqueue_batch_analysis, fail_stale_job
+from core.services.ai_client import AIError, stream_ai_analysis, track_ai_calls
+from core.services.analysis_pipeline import save_analysis, arun_analysis
+from core.services.prompts import build_analysis_prompt
+from core.services.report_sections import SECTION_FIELDS, SectionStreamParser
+from core.services.pdf_reports import (
+    PdfQueueFull,
+    PdfRenderError,
+    pdf_etag,
+    pdf_storage,
+    request_analysis_pdf,
+    request_history_pdf,
+)
 from core.services.security_scoring import calculate_final_security_score
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.utils import timezone
+from django.utils.text import slugify
+from datetime import timedelta
 
 
 # -------------------------------
-# Section Extractor
+# Generate Analysis
 # -------------------------------
-def extract_section(text, header):
+@login_required
+def generate_analysis(request, project_id):
+    project = get_object_or_404(Project, id=project_id, user=request.user)
+
+    # The LLM calls run on the worker pool; the user polls the job page.
+    job = enqueue_analysis(project, request.user)
+
+    return redirect("analysis_job_status", job_id=job.id)
+
+
+# -------------------------------
+# Generate Analysis (async / ASGI)
+# -------------------------------
+async def agenerate_analysis(request, project_id):
     """
-    Extract content under a section header until the next known header.
+    Native async variant of generate_analysis: under ASGI the request waits
+    on Gemini without occupying a worker thread.
     """
-    if header not in text:
-        return ""
+    # login_required does not wrap coroutine views in Django 5.0.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    project = await aget_object_or_404(Project, id=project_id, user=user)
+
+    try:
+        analysis = await arun_analysis(project, user)
+    except AIError as e:
+        messages.error(request, f"Security analysis failed: {e}")
+        return redirect("dashboard")
+
+    messages.success(
+        request,
+        f"Security analysis generated — Risk rating: {analysis.risk_category} ({analysis.security_score})",
+    )
+    return redirect("view_analysis", analysis_id=analysis.id)
+
 
-    section = text.split(header, 1)[1]
+# -------------------------------
+# Bulk Analysis
+# -------------------------------
+@login_required
+@require_POST
+def bulk_generate_analysis(request):
+    """
+    Queue a re-analysis of all of the user's projects (staff may pass
+    scope=all for every user). Answers 202 with the URL to poll for the
+    batch report, or 409 with the URL of the batch already in progress.
+    """
+    scope = BatchAnalysisJob.SCOPE_OWN
+    if request.POST.get("scope") == "all" and request.user.is_staff:
+        scope = BatchAnalysisJob.SCOPE_ALL
 
-    NEXT_HEADERS = [
-        "EXECUTIVE SUMMARY",
-        "SYSTEM ARCHITECTURE",
-        "THREAT MODEL",
-        "SECURE SDLC",
-        "COST ESTIMATION",
-        "SECURITY TESTING PLAN",
-    ]
+    job, created = enqueue_batch_analysis(request.user, scope)
+    status_url = reverse("batch_analysis_status", args=[job.id])
 
-    for next_header in NEXT_HEADERS:
-        if next_header in section and next_header != header:
-            section = section.split(next_header, 1)[0]
-            break
+    response = JsonResponse(
+        {"id": job.id, "status": job.status, "status_url": status_url},
+        status=202 if created else 409,
+    )
+    response["Location"] = status_url
+    return response
 
-    return section.strip()
+
+@login_required
+def batch_analysis_status(request, job_id):
+    job = get_object_or_404(BatchAnalysisJob, id=job_id, user=request.user)
+
+    if not job.is_finished:
+        fail_stale_job(job)
+
+    return JsonResponse({
+        "id": job.id,
+        "status": job.status,
+        "error": job.error,
+        "report": job.report,
+    })
 
 
 # -------------------------------
-# Generate Analysis
+# Analysis Job Status
 # -------------------------------
 @login_required
-def generate_analysis(request, project_id):
-    project = get_object_or_404(Project, id=project_id, user=request.user)
+def analysis_job_status(request, job_id):
+    job = get_object_or_404(AnalysisJob, id=job_id, user=request.user)
+
+    # Stop the status page polling forever for a job whose worker died.
+    if not job.is_finished:
+        fail_stale_job(job)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "id": job.id,
+            "status": job.status,
+            "error": job.error,
+            "redirect_url": reverse("analysis_job_status", args=[job.id]) if job.is_finished else None,
+        })
+
+    if job.status == AnalysisJob.STATUS_DONE and job.analysis_id:
+        analysis = job.analysis
+        messages.success(
+            request,
+            f"Security analysis generated — Risk rating: {analysis.risk_category} ({analysis.security_score})",
+        )
+        return redirect("view_analysis", analysis_id=job.analysis_id)
+
+    return render(request, "core/analysis_job_status.html", {
+        "job": job,
+        "project": job.project,
+    })
 
-    # Enhanced prompt with EXECUTIVE SUMMARY section
-    prompt = f"""
-You are a security architect AI. Generate a structured secure system analysis for the following project:
-
-Name: {project.name}
-Description: {project.description}
-Platform: {project.platform}
-Tech Stack: {project.tech_stack}
-Scale: {project.scale}
-Budget: {project.budget}
-Risk Level: {project.risk_level}
-
-Your response must contain sections with EXACT HEADERS:
-
-EXECUTIVE SUMMARY
-SYSTEM ARCHITECTURE
-THREAT MODEL
-SECURE SDLC
-COST ESTIMATION
-SECURITY TESTING PLAN
-
-EXECUTIVE SUMMARY must include:
-- Overall security posture (1–2 sentences)
-- Top 3 critical risks
-- Immediate actions recommended
-
-Make sure each section begins with its header in uppercase.
-"""
-
-    generated_text = generate_ai_analysis(prompt)
-
-    # Extract sections
-    executive_summary = extract_section(generated_text, "EXECUTIVE SUMMARY")
-    architecture = extract_section(generated_text, "SYSTEM ARCHITECTURE")
-    threat_model = extract_section(generated_text, "THREAT MODEL")
-    sdls_recommendations = extract_section(generated_text, "SECURE SDLC")
-    cost_estimation = extract_section(generated_text, "COST ESTIMATION")
-    testing_plan = extract_section(generated_text, "SECURITY TESTING PLAN")
-
-    # Save analysis
-    analysis = ProjectAnalysis.objects.create(
-        project=project,
-        user=request.user,
-        executive_summary=executive_summary,
-        architecture=architecture,
-        threat_model=threat_model,
-        cost_estimation=cost_estimation,
-        sdls_recommendations=sdls_recommendations,
-        testing_plan=testing_plan,
-    )
 
-    # Apply hybrid security scoring
-    score, category = calculate_final_security_score(project)
-    analysis.security_score = score
-    analysis.risk_category = category
-    analysis.save()
+# -------------------------------
+# Live (Streaming) Analysis
+# -------------------------------
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    messages.success(request, f"Security analysis generated — Risk rating: {category} ({score})")
 
-    return redirect("view_analysis", analysis_id=analysis.id)
+@login_required
+def live_analysis(request, project_id):
+    project = get_object_or_404(Project, id=project_id, user=request.user)
+    return render(request, "core/live_analysis.html", {
+        "project": project,
+        "sections": SECTION_FIELDS,
+    })
+
+
+@login_required
+def stream_analysis(request, project_id):
+    """
+    Server-Sent Events: one `section` event per report section as soon as
+    the model finishes it, then `done` with the saved analysis URL.
+    """
+    project = get_object_or_404(Project, id=project_id, user=request.user)
+    user = request.user
+
+    def event_stream():
+        with track_ai_calls() as ai_calls:
+            try:
+                yield from generate_events(ai_calls)
+            except Exception as e:
+                # Ending without an event would make EventSource reconnect
+                # and start a second generation.
+                print(f"Live analysis for project {project.id} failed: {e}")
+                yield _sse("failed", {"error": "The analysis could not be saved. Please try again."})
+
+    def generate_events(ai_calls):
+        parser = SectionStreamParser()
+        raw_text = []
+
+        try:
+            for chunk in stream_ai_analysis(build_analysis_prompt(project)):
+                raw_text.append(chunk)
+                for header, field, content in parser.feed(chunk):
+                    yield _sse("section", {"header": header, "field": field, "content": content})
+        except AIError as e:
+            yield _sse("failed", {"error": str(e)})
+            return
+
+        for header, field, content in parser.close():
+            yield _sse("section", {"header": header, "field": field, "content": content})
+
+        if not parser.sections:
+            # The raw output can be a whole report: log it, don't send it.
+            print(f"Live analysis for project {project.id} returned no sections: {''.join(raw_text).strip()!r}")
+            yield _sse("failed", {"error": "The AI response could not be read. Please try again."})
+            return
+
+        score, category = calculate_final_security_score(project)
+        analysis = save_analysis(project, user, parser.sections, score, category, ai_calls)
+
+        yield _sse("done", {
+            "url": reverse("view_analysis", args=[analysis.id]),
+            "security_score": score,
+            "risk_category": category,
+        })
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 # -------------------------------
@@ -113,33 +226,72 @@ Make sure each section begins with its header in uppercase.
 # -------------------------------
 @login_required
 def view_analysis(request, analysis_id):
-    analysis = get_object_or_404(ProjectAnalysis, id=analysis_id, user=request.user)
+    analysis = get_object_or_404(
+        ProjectAnalysis.objects.select_related("project", "report"), id=analysis_id, user=request.user
+    )
+    usage = analysis.ai_usage.aggregate(
+        calls=Count("id"),
+        prompt_tokens=Sum("prompt_tokens"),
+        response_tokens=Sum("response_tokens"),
+    )
     return render(request, "core/view_analysis.html", {
         "analysis": analysis,
-        "project": analysis.project
+        "project": analysis.project,
+        "usage": usage,
     })
 
 
 # -------------------------------
 # Analysis History
 # -------------------------------
+def _history_trend(analyses):
+    """
+    Highest/lowest/average score plus direction, computed in the database.
+    Analyses without a score (0) are ignored, as before.
+    """
+    scored = analyses.filter(security_score__gt=0)
+    stats = scored.aggregate(
+        highest=Max("security_score"),
+        lowest=Min("security_score"),
+        average=Avg("security_score"),
+        count=Count("id"),
+    )
+
+    newest = scored.order_by("-created_at", "-id").values_list("security_score", flat=True).first()
+    oldest = scored.order_by("created_at", "id").values_list("security_score", flat=True).first()
+
+    return {
+        "highest": stats["highest"] or 0,
+        "lowest": stats["lowest"] or 0,
+        "average": stats["average"] or 0,
+        "improving": oldest < newest if stats["count"] > 1 else False,
+    }
+
+
 @login_required
 def history_analysis(request, project_id):
     project = get_object_or_404(Project, id=project_id, user=request.user)
 
-    analyses = ProjectAnalysis.objects.filter(project=project).order_by("-created_at")
-    scores = [a.security_score for a in analyses if a.security_score > 0]
+    analyses = ProjectAnalysis.objects.filter(project=project)
 
-    trend_data = {
-        "highest": max(scores) if scores else 0,
-        "lowest": min(scores) if scores else 0,
-        "average": sum(scores)/len(scores) if scores else 0,
-        "improving": scores[-1] < scores[0] if len(scores) > 1 else False
-    }
+    # Optional time window: ?days=N
+    days = request.GET.get("days", "")
+    if days.isdigit() and int(days) > 0:
+        analyses = analyses.filter(created_at__gte=timezone.now() - timedelta(days=int(days)))
+
+    trend_data = _history_trend(analyses)
+
+    listing = (
+        analyses.only("id", "created_at", "security_score", "risk_category")
+        .order_by("-created_at")
+    )
+    page = Paginator(listing, settings.HISTORY_PAGE_SIZE).get_page(request.GET.get("page"))
 
     return render(request, "core/analysis_history.html", {
         "project": project,
-        "analyses": analyses,
+        "analyses": page,
+        "page": page,
+        "days": days,
         "trend": trend_data
     })
 
@@ -147,20 +299,83 @@ def history_analysis(request, project_id):
 # -------------------------------
 # Export PDF
 # -------------------------------
+def _pdf_analysis(request, analysis_id):
+    # Shared by the ETag and Last-Modified checks of one request.
+    if not hasattr(request, "_pdf_analysis"):
+        request._pdf_analysis = (
+            ProjectAnalysis.objects.filter(id=analysis_id, user=request.user)
+            .only("id", "created_at")
+            .first()
+        )
+    return request._pdf_analysis
+
+
+def _pdf_etag(request, analysis_id):
+    analysis = _pdf_analysis(request, analysis_id)
+    return pdf_etag(analysis.id) if analysis else None
+
+
+def _pdf_last_modified(request, analysis_id):
+    analysis = _pdf_analysis(request, analysis_id)
+    return analysis.created_at if analysis else None
+
+
+def _pdf_response(request, future, filename):
+    """
+    Serve a rendered PDF, or 202 + poll URL if it is still rendering after
+    PDF_WAIT_SECONDS (polling the same URL picks up the finished file).
+    """
+    try:
+        name = future.result(timeout=settings.PDF_WAIT_SECONDS)
+    except FutureTimeoutError:
+        poll_url = request.get_full_path()
+        response = JsonResponse({"status": "rendering", "poll_url": poll_url}, status=202)
+        response["Location"] = poll_url
+        response["Retry-After"] = "2"
+        return response
+    except PdfRenderError as e:
+        return HttpResponse(str(e), status=500)
+
+    response = FileResponse(
+        pdf_storage().open(name), as_attachment=True, filename=filename,
+        content_type="application/pdf",
+    )
+    # The report is per-user: browsers may keep it, shared caches may not.
+    patch_cache_control(response, private=True, max_age=0)
+    return response
+
+
+def _queue_full_response():
+    response = HttpResponse("PDF rendering is busy, please retry shortly.", status=503)
+    response["Retry-After"] = "5"
+    return response
+
+
 @login_required
+@condition(etag_func=_pdf_etag, last_modified_func=_pdf_last_modified)
 def download_analysis_pdf(request, analysis_id):
-    analysis = get_object_or_404(ProjectAnalysis, id=analysis_id, user=request.user)
-    project = analysis.project
+    analysis = get_object_or_404(
+        ProjectAnalysis.objects.select_related("project", "report"), id=analysis_id, user=request.user
+    )
 
-    html_content = render_to_string("core/analysis_pdf.html", {
-        "analysis": analysis,
-        "project": project
-    })
+    try:
+        future = request_analysis_pdf(analysis)
+    except PdfQueueFull:
+        return _queue_full_response()
 
-    pdf_file = HTML(string=html_content).write_pdf()
+    return _pdf_response(request, future, f"analysis_{analysis_id}.pdf")
 
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename=\"analysis_{analysis_id}.pdf\"'
-    return response
 
+@login_required
+def download_history_pdf(request, project_id):
+    project = get_object_or_404(Project, id=project_id, user=request.user)
+
+    if not project.analyses.exists():
+        return HttpResponse("No analyses available to export.")
+
+    try:
+        future = request_history_pdf(project)
+    except PdfQueueFull:
+        return _queue_full_response()
 
+    return _pdf_response(request, future, f"{slugify(project.name)}_analysis_history.pdf")
@@ -1,8 +1,23 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from core.models import Project
+from core.models import Project, ProjectAnalysis
 
 @login_required
 def dashboard(request):
-    projects = Project.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, "core/dashboard.html", {"projects": projects})
+    # Latest analysis per project, fetched in the same query as the projects.
+    latest = ProjectAnalysis.objects.filter(project=OuterRef("pk")).order_by("-created_at", "-id")
+
+    projects = (
+        Project.objects.filter(user=request.user)
+        .annotate(
+            latest_score=Subquery(latest.values("security_score")[:1]),
+            latest_category=Subquery(latest.values("risk_category")[:1]),
+        )
+        .order_by('-created_at')
+    )
+
+    page = Paginator(projects, settings.DASHBOARD_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(request, "core/dashboard.html", {"projects": page, "page": page})
@@ -1,11 +1,21 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from core.models.project_analysis import ProjectAnalysis
 from core.models.project import Project
-import io
+from core.models.analysis_report import prefetch_section_texts
+from core.services.metrics import EXPORT_SIZE
+import itertools
 import zipfile
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.cache import patch_cache_control
 from django.utils.text import slugify
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
 
 
 
@@ -40,44 +50,162 @@ Security Testing Plan
 """.strip()
 
 
-@login_required
-def export_analysis_md(request, analysis_id):
-    analysis = get_object_or_404(ProjectAnalysis, id=analysis_id, user=request.user)
-    content = build_export_content(analysis)
+# Bump when build_export_content() changes to invalidate memoized exports.
+EXPORT_VERSION = "1"
+
+EXPORT_CONTENT_TYPES = {
+    "md": "text/markdown",
+    "txt": "text/plain",
+}
+
+
+def render_export(analysis_id, fmt):
+    """
+    Export text of an analysis in `fmt`, memoized in the cache: analyses
+    never change after creation.
+    """
+    key = f"export:{EXPORT_VERSION}:{fmt}:{analysis_id}"
+    content = cache.get(key)
+
+    if content is None:
+        analysis = ProjectAnalysis.objects.select_related("project", "report").get(id=analysis_id)
+        content = build_export_content(analysis)
+        cache.set(key, content, settings.EXPORT_CACHE_TTL)
+
+    return content
+
+
+def _export_analysis(request, analysis_id):
+    # Shared by the ETag and Last-Modified checks of one request.
+    if not hasattr(request, "_export_analysis"):
+        request._export_analysis = (
+            ProjectAnalysis.objects.filter(id=analysis_id, user=request.user)
+            .only("id", "created_at")
+            .first()
+        )
+    return request._export_analysis
+
 
-    response = HttpResponse(content, content_type="text/markdown")
-    response["Content-Disposition"] = f"attachment; filename=analysis_{analysis_id}.md"
+def _export_etag(request, analysis_id):
+    analysis = _export_analysis(request, analysis_id)
+    return f"{analysis.id}-{EXPORT_VERSION}" if analysis else None
+
+
+def _export_last_modified(request, analysis_id):
+    analysis = _export_analysis(request, analysis_id)
+    return analysis.created_at if analysis else None
+
+
+def _export_response(request, analysis_id, fmt):
+    if _export_analysis(request, analysis_id) is None:
+        raise Http404("No analysis matches the given query.")
+
+    response = HttpResponse(render_export(analysis_id, fmt), content_type=EXPORT_CONTENT_TYPES[fmt])
+    EXPORT_SIZE.observe(len(response.content), format=fmt)
+    response["Content-Disposition"] = f"attachment; filename=analysis_{analysis_id}.{fmt}"
+    patch_cache_control(response, private=True, max_age=0)
     return response
 
 
 @login_required
+@gzip_page
+@condition(etag_func=_export_etag, last_modified_func=_export_last_modified)
+def export_analysis_md(request, analysis_id):
+    return _export_response(request, analysis_id, "md")
+
+
+@login_required
+@gzip_page
+@condition(etag_func=_export_etag, last_modified_func=_export_last_modified)
 def export_analysis_txt(request, analysis_id):
-    analysis = get_object_or_404(ProjectAnalysis, id=analysis_id, user=request.user)
-    content = build_export_content(analysis)
+    return _export_response(request, analysis_id, "txt")
+
+class _ZipStream:
+    """
+    Write-only sink for ZipFile: written bytes are collected until the
+    streaming response picks them up with drain().
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_filename(project, analysis):
+    # The id keeps entries unique when several analyses share the same minute.
+    return f"{slugify(project.name)}_{analysis.created_at.strftime('%Y-%m-%d_%H-%M')}_{analysis.id}.md"
+
+
+def _stream_history_zip(project, analyses, chunk_size):
+    sink = _ZipStream()
+    size = 0
+
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        iterator = analyses.iterator(chunk_size=chunk_size)
+
+        while chunk := list(itertools.islice(iterator, chunk_size)):
+            prefetch_section_texts(
+                [analysis.report for analysis in chunk if hasattr(analysis, "report")]
+            )
+            for analysis in chunk:
+                entry = zipfile.ZipInfo(
+                    _zip_filename(project, analysis),
+                    date_time=analysis.created_at.timetuple()[:6],
+                )
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                zip_file.writestr(entry, build_export_content(analysis))
+                data = sink.drain()
+                size += len(data)
+                yield data
+
+    # Central directory
+    data = sink.drain()
+    EXPORT_SIZE.observe(size + len(data), format="zip")
+    yield data
+
+
+def _date_param(request, name):
+    try:
+        return parse_date(request.GET.get(name, ""))
+    except ValueError:
+        return None
 
-    response = HttpResponse(content, content_type="text/plain")
-    response["Content-Disposition"] = f"attachment; filename=analysis_{analysis_id}.txt"
-    return response
 
 @login_required
 def export_analysis_history_zip(request, project_id):
     project = get_object_or_404(Project, id=project_id, user=request.user)
-    analyses = project.analyses.all().order_by("created_at")
+    analyses = project.analyses.select_related("report").order_by("created_at")
 
-    if not analyses.exists():
-        return HttpResponse("No analyses available to export.")
+    # Optional date range: ?days=N, or ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive)
+    days = request.GET.get("days", "")
+    if days.isdigit() and int(days) > 0:
+        analyses = analyses.filter(created_at__gte=timezone.now() - timedelta(days=int(days)))
 
-    zip_buffer = io.BytesIO()
+    date_from = _date_param(request, "from")
+    if date_from:
+        analyses = analyses.filter(created_at__date__gte=date_from)
 
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for analysis in analyses:
-            filename = f"{slugify(project.name)}_{analysis.created_at.strftime('%Y-%m-%d_%H-%M')}.md"
-            content = build_export_content(analysis)
-            zip_file.writestr(filename, content)
+    date_to = _date_param(request, "to")
+    if date_to:
+        analyses = analyses.filter(created_at__date__lte=date_to)
 
-    zip_buffer.seek(0)
+    if not analyses.exists():
+        return HttpResponse("No analyses available to export.")
 
-    response = HttpResponse(zip_buffer, content_type="application/zip")
+    response = StreamingHttpResponse(
+        _stream_history_zip(project, analyses, settings.EXPORT_CHUNK_SIZE),
+        content_type="application/zip",
+    )
     response["Content-Disposition"] = (
         f"attachment; filename={slugify(project.name)}_analysis_history.zip"
     )
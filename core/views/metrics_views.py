@@ -0,0 +1,78 @@
+import hmac
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+from django.utils import timezone
+
+from core.models.ai_usage import AIUsage
+from core.services.metrics import render_metrics
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of this process's metrics. Readable by staff
+    users, scrapers presenting METRICS_TOKEN, and METRICS_ALLOWED_IPS.
+    """
+    allowed = (
+        request.user.is_staff
+        or _has_metrics_token(request)
+        or request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    )
+    if not allowed:
+        return HttpResponseForbidden("Metrics are only available to staff.")
+
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -------------------------------
+# AI Usage Report
+# -------------------------------
+@staff_member_required
+def ai_usage_report(request):
+    """
+    Model calls, tokens and latency per user per day (?days=N, default 30).
+    """
+    days = request.GET.get("days", "30")
+    usage = AIUsage.objects.all()
+    if days.isdigit():
+        usage = usage.filter(created_at__gte=timezone.now() - timedelta(days=int(days)))
+
+    rows = (
+        usage.annotate(day=TruncDate("created_at"))
+        .values("day", "user__username")
+        .annotate(
+            calls=Count("id"),
+            analyses=Count("analysis", distinct=True),
+            cached_calls=Count("id", filter=Q(cached=True)),
+            prompt_total=Sum("prompt_tokens"),
+            response_total=Sum("response_tokens"),
+            avg_latency_ms=Avg("latency_ms", filter=Q(cached=False)),
+            max_latency_ms=Max("latency_ms"),
+        )
+        .order_by("-day", "user__username")
+    )
+    totals = usage.aggregate(
+        calls=Count("id"),
+        prompt_tokens=Sum("prompt_tokens"),
+        response_tokens=Sum("response_tokens"),
+    )
+
+    return render(request, "core/ai_usage_report.html", {
+        "rows": rows,
+        "totals": totals,
+        "days": days,
+    })
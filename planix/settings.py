@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -141,3 +142,115 @@ INSTALLED_APPS = [
     'rest_framework',
     'core',
 ]
+
+# Analysis job queue (in-process worker pool backed by the AnalysisJob table)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+ANALYSIS_JOBS_EAGER = os.getenv("ANALYSIS_JOBS_EAGER", "False") == "True"
+# A running job refreshes its heartbeat (updated_at) this often; one whose
+# heartbeat is older than ANALYSIS_JOB_STALE_SECONDS has lost its worker
+ANALYSIS_JOB_HEARTBEAT_SECONDS = float(os.getenv("ANALYSIS_JOB_HEARTBEAT_SECONDS", "30"))
+ANALYSIS_JOB_STALE_SECONDS = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "600"))
+
+# Batch (re)analysis: generation pool size and provider calls per minute
+BATCH_ANALYSIS_WORKERS = int(os.getenv("BATCH_ANALYSIS_WORKERS", "4"))
+BATCH_ANALYSIS_RATE_PER_MINUTE = float(os.getenv("BATCH_ANALYSIS_RATE_PER_MINUTE", "60"))
+
+# Maximum concurrent Gemini requests per event loop for the async client
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+# Seconds a request may wait for one of those slots (not counted against GEMINI_TIMEOUT)
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "60"))
+
+# Caches. "ai_responses" holds LLM replies keyed by a hash of model + prompt;
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is reached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared by every worker process on the host (gunicorn workers, job runners).
+    "shared": {
+        "BACKEND": os.getenv("SHARED_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", str(BASE_DIR / ".cache" / "shared")),
+    },
+    "ai_responses": {
+        "BACKEND": os.getenv("AI_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("AI_CACHE_LOCATION", "planix-ai-responses"),
+        "TIMEOUT": int(os.getenv("AI_CACHE_TTL", "86400")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("AI_CACHE_MAX_ENTRIES", "500")),
+        },
+    },
+}
+
+# Gemini model discovery: how long the selected model is reused, the
+# backoff applied after a failed listing, and optional warm-up at startup
+GEMINI_MODEL_TTL = int(os.getenv("GEMINI_MODEL_TTL", "3600"))
+GEMINI_MODEL_FAILURE_BACKOFF = int(os.getenv("GEMINI_MODEL_FAILURE_BACKOFF", "30"))
+GEMINI_MODEL_FAILURE_BACKOFF_MAX = int(os.getenv("GEMINI_MODEL_FAILURE_BACKOFF_MAX", "900"))
+GEMINI_WARMUP = os.getenv("GEMINI_WARMUP", "False") == "True"
+
+# Gemini call resilience: per-call deadline (seconds), retries for transient
+# errors with jittered exponential backoff, and the circuit breaker
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "1.0"))
+GEMINI_RETRY_BACKOFF_MAX = float(os.getenv("GEMINI_RETRY_BACKOFF_MAX", "10"))
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GEMINI_CIRCUIT_RESET_SECONDS = float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30"))
+
+# AI backend: "gemini" (live), "local" (offline templated responses) or
+# "replay" (record/replay Gemini responses), or a dotted path to an AIBackend
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini")
+AI_LOCAL_LATENCY = float(os.getenv("AI_LOCAL_LATENCY", "0"))
+AI_LOCAL_FAILURE_RATE = float(os.getenv("AI_LOCAL_FAILURE_RATE", "0"))
+AI_LOCAL_SEED = os.getenv("AI_LOCAL_SEED")
+AI_REPLAY_FILE = os.getenv("AI_REPLAY_FILE", str(BASE_DIR / "ai_recordings.jsonl"))
+AI_REPLAY_MODE = os.getenv("AI_REPLAY_MODE", "replay")
+AI_REPLAY_LATENCY = os.getenv("AI_REPLAY_LATENCY", "False") == "True"
+
+# Projects per dashboard page
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "25"))
+
+# Prompt budget: estimated tokens (~4 chars each) allowed for the project
+# description, the only unbounded field; longer text is condensed and
+# truncated before it is sent to the model
+PROMPT_DESCRIPTION_MAX_TOKENS = int(os.getenv("PROMPT_DESCRIPTION_MAX_TOKENS", "1500"))
+
+# /metrics is staff-only by default. Scrapers send
+# "Authorization: Bearer <METRICS_TOKEN>" instead of logging in
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Optional REMOTE_ADDR allow-list. Only safe when clients connect directly:
+# behind a reverse proxy on the same host every request comes from 127.0.0.1
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()
+]
+
+# Analyses per history page (the chart plots the current page)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+
+# Analyses fetched per query while streaming the history ZIP export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "200"))
+
+# How long rendered Markdown/TXT exports are memoized
+EXPORT_CACHE_TTL = int(os.getenv("EXPORT_CACHE_TTL", "86400"))
+
+# Rendered analysis PDFs, keyed by analysis id and template version
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "pdf_reports": {
+        "BACKEND": os.getenv("PDF_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage"),
+        "OPTIONS": {"location": os.getenv("PDF_CACHE_DIR", str(BASE_DIR / ".cache" / "pdf"))},
+    },
+}
+# Bump to invalidate cached PDFs; defaults to a hash of analysis_pdf.html
+PDF_TEMPLATE_VERSION = os.getenv("PDF_TEMPLATE_VERSION", "")
+PDF_PRERENDER = os.getenv("PDF_PRERENDER", "True") == "True"
+
+# PDF rendering process pool (0 workers renders inline): renders in flight
+# before downloads get 503, per-render timeout and memory cap, and how long
+# a download waits before answering 202 with a poll URL
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "16"))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "60"))
+PDF_RENDER_MEMORY_MB = int(os.getenv("PDF_RENDER_MEMORY_MB", "1024"))
+PDF_WAIT_SECONDS = float(os.getenv("PDF_WAIT_SECONDS", "10"))
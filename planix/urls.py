@@ -3,18 +3,30 @@ from django.urls import path
 from core.views.dashboard_views import dashboard
 from core.views.project_views import create_project
 from core.views.analysis_views import generate_analysis, view_analysis, history_analysis, download_analysis_pdf
+from core.views.analysis_views import analysis_job_status, live_analysis, stream_analysis, agenerate_analysis
+from core.views.analysis_views import bulk_generate_analysis, batch_analysis_status, download_history_pdf
 from core.views.export_views import export_analysis_md, export_analysis_txt
 from core.views.export_views import export_analysis_history_zip
+from core.views.metrics_views import metrics, ai_usage_report
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics, name="metrics"),
+    path("reports/ai-usage/", ai_usage_report, name="ai_usage_report"),
 
     # Project actions
     path("project/create/", create_project, name="create_project"),
     path("project/<int:project_id>/analysis/", generate_analysis, name="generate_analysis"),
+    path("project/<int:project_id>/analysis/async/", agenerate_analysis, name="agenerate_analysis"),
+    path("project/<int:project_id>/analysis/live/", live_analysis, name="live_analysis"),
+    path("project/<int:project_id>/analysis/stream/", stream_analysis, name="stream_analysis"),
+    path("project/analysis/bulk/", bulk_generate_analysis, name="bulk_generate_analysis"),
+    path("analysis/batch/<int:job_id>/", batch_analysis_status, name="batch_analysis_status"),
+    path("analysis/job/<int:job_id>/", analysis_job_status, name="analysis_job_status"),
     path("analysis/<int:analysis_id>/", view_analysis, name="view_analysis"),
     path("project/<int:project_id>/analysis/history/", history_analysis, name="analysis_history"),
     path("analysis/<int:analysis_id>/pdf/", download_analysis_pdf, name="download_analysis_pdf"),
+    path("project/<int:project_id>/analysis/history/pdf/", download_history_pdf, name="download_history_pdf"),
     # Export actions
     path("analysis/<int:analysis_id>/export/md/", export_analysis_md, name="export_analysis_md"),
     path("analysis/<int:analysis_id>/export/txt/", export_analysis_txt, name="export_analysis_txt"),